@@ -0,0 +1,298 @@
+import json
+import os
+import queue
+import shlex
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from formatting import get_number_formatter, get_snapshot_formatter  # Import the number formatting of the labels
+from history import metric_values  # Import the numbers kept from each source
+
+HOOK_TIMEOUT = 30  # Seconds an alert hook may run before it is killed
+UNITS = {'fees': "sat/vB", 'hashrate': "EH/s", 'unconfirmed_tx': "TX", 'block_height': ""}  # Units in alert messages
+
+
+class Rule(ABC):
+    def __init__(self, name, metric):
+        """Initializes the state of one compiled alert rule.
+
+        Args:
+            name (str): The text shown when the rule fires.
+            metric (str): The history metric the rule watches, like "fees" or "price:usd".
+        """
+        self.name = name
+        self.metric = metric
+        self.key = None  # The metric and setting the rule was compiled from, set by compile_rule
+
+    @abstractmethod
+    def evaluate(self, value, now):
+        """Takes the next value of the metric and returns whether the rule fires."""
+
+
+class CrossRule(Rule):
+    def __init__(self, name, metric, threshold):
+        """Initializes a rule that fires whenever the value crosses a threshold in either direction."""
+        super().__init__(name, metric)
+        self.threshold = threshold
+        self.above = None  # Side of the threshold of the last value, None before the first one
+
+    def evaluate(self, value, now):
+        above = value >= self.threshold
+        crossed = self.above is not None and above != self.above
+        self.above = above
+        return crossed
+
+
+class LimitRule(Rule):
+    def __init__(self, name, metric, limit, above):
+        """Initializes a rule that fires once the value goes above or below a limit.
+
+        It fires again only after the value went back to the other side.
+        """
+        super().__init__(name, metric)
+        self.limit = limit
+        self.above = above
+        self.armed = True
+
+    def evaluate(self, value, now):
+        beyond = value > self.limit if self.above else value < self.limit
+        fired = beyond and self.armed
+        self.armed = not beyond
+        return fired
+
+
+class ChangeRule(Rule):
+    def __init__(self, name, metric, percent, window):
+        """Initializes a rule that fires when the value moves by a percentage within a time window.
+
+        The lowest and highest value of the window are kept in monotonic queues, so each
+        new value costs amortized constant time instead of a scan over the window.
+
+        Args:
+            percent (float): The move in percent of the lowest or highest value of the window.
+            window (float): The window in seconds.
+        """
+        super().__init__(name, metric)
+        self.percent = percent
+        self.window = window
+        self.lows = deque()  # (time, value) with rising values, the lowest of the window first
+        self.highs = deque()  # (time, value) with falling values, the highest of the window first
+        self.armed = True
+
+    def evaluate(self, value, now):
+        while self.lows and self.lows[-1][1] >= value:
+            self.lows.pop()
+        self.lows.append((now, value))
+        while self.highs and self.highs[-1][1] <= value:
+            self.highs.pop()
+        self.highs.append((now, value))
+        cutoff = now - self.window
+        while self.lows[0][0] < cutoff:
+            self.lows.popleft()
+        while self.highs[0][0] < cutoff:
+            self.highs.popleft()
+
+        low, high = self.lows[0][1], self.highs[0][1]
+        rise = (value - low) / low * 100 if low else 0.0
+        fall = (high - value) / high * 100 if high else 0.0
+        moved = max(rise, fall) >= self.percent
+        fired = moved and self.armed
+        self.armed = not moved  # Fires again once the move has left the window
+        return fired
+
+
+class NewBlockRule(Rule):
+    def __init__(self, name):
+        """Initializes a rule that fires when the block height grows."""
+        super().__init__(name, 'block_height')
+        self.height = None
+
+    def evaluate(self, value, now):
+        fired = self.height is not None and value > self.height
+        self.height = value if self.height is None else max(self.height, value)
+        return fired
+
+
+def compile_rule(config, currency):
+    """Turns one rule of the "alerts" setting into a Rule.
+
+    Args:
+        config (dict): The rule, like {"metric": "fees", "above": 50},
+            {"metric": "price", "crosses": 70000}, {"metric": "price", "change_pct": 3, "window": 900}
+            or {"event": "new_block"}. "name" overrides the shown text, "currency"
+            the currency of price rules.
+        currency (str): The currency of price rules without their own.
+
+    Returns:
+        Rule: The compiled rule.
+
+    Raises:
+        ValueError: If the rule is not understood.
+    """
+    rule = _build_rule(config, currency)
+    rule.key = (rule.metric, json.dumps(config, sort_keys=True))
+    return rule
+
+
+def _build_rule(config, currency):
+    """Returns the Rule of one rule setting, see compile_rule."""
+    if config.get('event') == 'new_block':
+        return NewBlockRule(config.get('name', "New block"))
+    metric = config.get('metric')
+    if metric == 'price':
+        metric = f"price:{config.get('currency', currency)}"
+    elif metric not in UNITS:
+        raise ValueError(f"unknown metric {metric!r}")
+
+    label = metric.split(':')[0].replace('_', ' ').capitalize()
+    if 'crosses' in config:
+        return CrossRule(config.get('name', f"{label} crossed {config['crosses']}"), metric, float(config['crosses']))
+    if 'above' in config:
+        return LimitRule(config.get('name', f"{label} above {config['above']}"), metric, float(config['above']), True)
+    if 'below' in config:
+        return LimitRule(config.get('name', f"{label} below {config['below']}"), metric, float(config['below']), False)
+    if 'change_pct' in config:
+        window = float(config.get('window', 900))
+        name = config.get('name', f"{label} moved {config['change_pct']} % in {window / 60:.0f} min")
+        return ChangeRule(name, metric, float(config['change_pct']), window)
+    raise ValueError("a rule needs crosses, above, below, change_pct or event")
+
+
+def carry_state(old_rules, new_rules):
+    """Keeps the old Rule object, with its state, of every rule that compiled to the same key.
+
+    Reconfiguring, for example after a currency switch, then only resets the rules
+    that changed, and unchanged ones do not fire again for a condition that never cleared.
+
+    Args:
+        old_rules (dict): The current lists of Rule objects keyed by metric.
+        new_rules (dict): The newly compiled ones.
+
+    Returns:
+        dict: new_rules with the unchanged rules replaced by their old objects.
+    """
+    old = {}
+    for rules in old_rules.values():
+        for rule in rules:
+            old.setdefault(rule.key, []).append(rule)
+    return {metric: [old[rule.key].pop(0) if old.get(rule.key) else rule for rule in rules] for metric, rules in new_rules.items()}
+
+
+def compile_rules(configs, currency):
+    """Compiles the "alerts" setting, skipping invalid rules.
+
+    Returns:
+        dict: Lists of Rule objects keyed by the metric they watch.
+    """
+    rules = {}
+    for config in configs or []:
+        try:
+            rule = compile_rule(config, currency)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            print(f"Error: ignoring alert rule {config!r}: {e}")
+            continue
+        rules.setdefault(rule.metric, []).append(rule)
+    return rules
+
+
+class AlertEngine:
+    def __init__(self, on_alert):
+        """Initializes the engine that evaluates the alert rules in a thread of its own.
+
+        Args:
+            on_alert (callable): Called from the alert thread with the message of each
+                fired alert. Use a queued signal to reach the GUI thread.
+        """
+        self.on_alert = on_alert
+        self.rules = {}  # Lists of Rule objects keyed by metric, only used by the alert thread
+        self.hook = None  # Command run for every fired alert
+        self.last_seen = {}  # Time of the last evaluated value of each metric
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def configure(self, configs, currency, hook=None):
+        """Compiles new rules and hands them to the alert thread.
+
+        Rules that did not change keep their state, only new and changed ones start over.
+
+        Args:
+            configs (list): The "alerts" setting.
+            currency (str): The currency of price rules without their own.
+            hook (str, optional): The "alert_hook" setting, a command line.
+        """
+        self.queue.put(('configure', compile_rules(configs, currency), hook))
+
+    def submit(self, results):
+        """Queues fetched results for evaluation, returning right away.
+
+        Args:
+            results (dict): SourceResult objects keyed by source name.
+        """
+        self.queue.put(('results', results))
+
+    def start(self):
+        """Starts the alert thread."""
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run, name="biwi-alerts", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stops the alert thread after the queued work."""
+        self.queue.put(None)
+
+    def run(self):
+        """Evaluates the queued results until stopped."""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if item[0] == 'configure':
+                _, rules, self.hook = item
+                self.rules = carry_state(self.rules, rules)
+            else:
+                for message in self.evaluate(item[1]):
+                    self.on_alert(message)
+                    self.run_hook(message)
+
+    def evaluate(self, results):
+        """Feeds the fresh values of results to the rules watching them.
+
+        Only the rules of metrics that changed are touched, so a snapshot costs
+        O(rules) at most.
+
+        Returns:
+            list: The messages of the fired alerts.
+        """
+        messages = []
+        currencies = {metric.split(':')[1] for metric in self.rules if metric.startswith('price:')}
+        for name, result in results.items():
+            if not result.ok or result.stale or result.value is None or result.fetched_at is None:
+                continue
+            for currency in (currencies if name == 'market' else [None]):
+                for metric, value in metric_values(name, result.value, currency):
+                    rules = self.rules.get(metric)
+                    if not rules or result.fetched_at <= self.last_seen.get(metric, 0):
+                        continue  # Not watched, or already seen through another path
+                    self.last_seen[metric] = result.fetched_at
+                    for rule in rules:
+                        if rule.evaluate(value, result.fetched_at):
+                            messages.append(f"{time.strftime('%H:%M', time.localtime(result.fetched_at))} {rule.name}: {format_value(metric, value)}")
+        return messages
+
+    def run_hook(self, message):
+        """Runs the alert hook with the message in $BIWI_ALERT, waiting in this thread only."""
+        if not self.hook:
+            return
+        try:
+            subprocess.run(shlex.split(self.hook), env=dict(os.environ, BIWI_ALERT=message), timeout=HOOK_TIMEOUT)
+        except (OSError, ValueError, subprocess.SubprocessError) as e:
+            print(f"Error running the alert hook: {e}")
+
+
+def format_value(metric, value):
+    """Formats the value of a metric for an alert message, like "70.123 €" or "52 sat/vB"."""
+    if metric.startswith('price:'):
+        return f"{get_number_formatter().integer(value)} {get_snapshot_formatter(metric.split(':')[1]).currency_symbol}"
+    return f"{get_number_formatter().integer(value)} {UNITS[metric]}".rstrip()
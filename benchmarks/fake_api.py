@@ -0,0 +1,229 @@
+"""Local stand-in for the CoinGecko and mempool.space endpoints used by bitcoin_data.py.
+
+The server answers with payloads of the same shape and roughly the same size as the real
+APIs, after a configurable latency, and can fail or hang on a share of the requests:
+
+    server = FakeApiServer(latency=0.05, error_rate=0.1)
+    server.start()
+    install_redirect(server.base_url)  # Route the shared session to the stand-in
+    ...
+    server.stop()
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+CURRENCIES = ["eur", "usd", "jpy", "gbp", "chf", "cad", "aud", "nzd", "cny", "rub",
+              "brl", "inr", "mxn", "sgd", "hkd", "krw", "try", "zar", "sek", "nok"]
+UPSTREAM_HOSTS = ("https://api.coingecko.com", "https://mempool.space")
+
+
+def _per_currency(value):
+    return {currency: value * (index + 1) for index, currency in enumerate(CURRENCIES)}
+
+
+def market_payload():
+    """Returns a coins/bitcoin response with the fields bitcoin_data reads and the same amount of others."""
+    market_data = {
+        "current_price": _per_currency(61234.5),
+        "price_change_percentage_24h_in_currency": _per_currency(1.2345),
+        "market_cap": _per_currency(1.21e12),
+        "high_24h": _per_currency(62000),
+        "low_24h": _per_currency(60000),
+        "circulating_supply": 19_750_000.0,
+        "total_volume": _per_currency(3e10),
+        "ath": _per_currency(69000),
+        "ath_change_percentage": _per_currency(-10.5),
+        "ath_date": {currency: "2024-03-14T07:10:36.635Z" for currency in CURRENCIES},
+    }
+    for field in ("atl", "atl_change_percentage", "market_cap_change_24h", "fully_diluted_valuation",
+                  "price_change_percentage_7d_in_currency", "price_change_percentage_30d_in_currency"):
+        market_data[field] = _per_currency(1.0)  # Fields the widget ignores but still has to download
+    return {"id": "bitcoin", "symbol": "btc", "description": {"en": "x" * 4000}, "market_data": market_data}
+
+
+def hashrate_payload(now, samples=7):
+    """Returns a mining/hashrate/1w response with one entry per sample and per difficulty adjustment."""
+    day = 24 * 60 * 60
+    return {
+        "hashrates": [{"timestamp": int(now - day * i), "avgHashrate": 6.1e20 + i * 1e18} for i in range(samples)],
+        "difficulty": [{"time": int(now - day * i), "height": 850_000 - 144 * i, "difficulty": 8.3e13, "adjustment": 1.01} for i in range(samples)],
+        "currentHashrate": 6.1e20,
+        "currentDifficulty": 8.3e13,
+    }
+
+
+def mempool_payload(buckets=300):
+    """Returns a mempool response including its fee histogram."""
+    return {
+        "count": 45_678,
+        "vsize": 31_000_000,
+        "total_fee": 123_456_789,
+        "fee_histogram": [[round(200 / (i + 1), 3), 50_000 + i * 100] for i in range(buckets)],
+    }
+
+
+def mempool_blocks_payload(blocks=8):
+    """Returns a fees/mempool-blocks response, the last block holding the rest of the mempool."""
+    return [
+        {
+            "blockSize": 1_600_000,
+            "blockVSize": 997_000 if i < blocks - 1 else 24_000_000,
+            "nTx": 3_000,
+            "totalFees": 9_000_000 // (i + 1),
+            "medianFee": round(40 / (i + 1), 2),
+            "feeRange": [round(30 / (i + 1), 2), round(35 / (i + 1), 2), round(50 / (i + 1), 2), round(200 / (i + 1), 2)],
+        }
+        for i in range(blocks)
+    ]
+
+
+class FakeApiServer:
+    def __init__(self, latency=0.05, jitter=0.5, error_rate=0.0, timeout_rate=0.0, hang=30.0,
+                 rate_limit_rate=0.0, retry_after=1, seed=None):
+        """Initializes the stand-in server.
+
+        Args:
+            latency (float): Mean seconds before an answer.
+            jitter (float): Share of the latency that varies randomly in both directions.
+            error_rate (float): Share of requests answered with HTTP 500.
+            timeout_rate (float): Share of requests that hang for `hang` seconds before answering.
+            hang (float): Seconds a hanging request waits, longer than the client timeout.
+            rate_limit_rate (float): Share of requests answered with HTTP 429.
+            retry_after (int): The Retry-After header of the 429 answers in seconds.
+            seed (int, optional): Seed of the random failures, for repeatable runs.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang = hang
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.requests = 0  # Requests answered so far
+        self.bytes_sent = 0  # Body bytes sent so far
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()  # Ends hanging requests on stop
+        self.server = None
+        self.payloads = self.build_payloads()
+
+    def build_payloads(self):
+        """Returns the encoded body of each known path."""
+        now = time.time()
+        payloads = {
+            "/api/v3/coins/bitcoin": market_payload(),
+            "/api/v1/fees/recommended": {"fastestFee": 12, "halfHourFee": 8, "hourFee": 5, "economyFee": 3, "minimumFee": 1},
+            "/api/v1/mining/hashrate/1w": hashrate_payload(now),
+            "/api/mempool": mempool_payload(),
+            "/api/v1/fees/mempool-blocks": mempool_blocks_payload(),
+        }
+        encoded = {path: json.dumps(body).encode() for path, body in payloads.items()}
+        encoded["/api/blocks/tip/height"] = b"850123"
+        return encoded
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def configure(self, **settings):
+        """Changes latency, jitter, error_rate, timeout_rate, hang, rate_limit_rate or retry_after between benchmark runs."""
+        for name, value in settings.items():
+            if not hasattr(self, name):
+                raise AttributeError(name)
+            setattr(self, name, value)
+
+    def start(self):
+        """Starts serving on a free local port in a background thread."""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs
+
+            def do_GET(self):
+                fake.handle(self)
+
+            def log_message(self, format, *args):
+                pass  # Keep the benchmark output readable
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="fake-api", daemon=True).start()
+
+    def stop(self):
+        """Stops the server and releases hanging requests."""
+        self.stopped.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def handle(self, request):
+        """Answers one request after the configured latency, failing, limiting or hanging on a share of them."""
+        with self.lock:
+            roll = self.random.random()
+            delay = self.latency * (1 + self.jitter * (2 * self.random.random() - 1))
+        if roll < self.timeout_rate:
+            self.stopped.wait(self.hang)
+        else:
+            time.sleep(max(0.0, delay))
+
+        body = self.payloads.get(urlsplit(request.path).path)
+        headers = {}
+        if roll >= self.timeout_rate and roll < self.timeout_rate + self.error_rate:
+            status, body = 500, b'{"error": "injected failure"}'
+        elif roll >= self.timeout_rate + self.error_rate and roll < self.timeout_rate + self.error_rate + self.rate_limit_rate:
+            status, body = 429, b'{"error": "rate limited"}'
+            headers["Retry-After"] = str(self.retry_after)
+        elif body is None:
+            status, body = 404, b'{"error": "unknown path"}'
+        else:
+            status = 200
+        try:
+            request.send_response(status)
+            request.send_header("Content-Type", "application/json")
+            request.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                request.send_header(name, value)
+            request.end_headers()
+            request.wfile.write(body)
+        except OSError:
+            return  # The client gave up waiting
+        with self.lock:
+            self.requests += 1
+            self.bytes_sent += len(body)
+
+
+class RedirectAdapter(HTTPAdapter):
+    def __init__(self, base_url, **kwargs):
+        """Initializes a transport adapter that sends requests for an upstream to the stand-in.
+
+        Args:
+            base_url (str): The scheme, host and port of the stand-in server.
+        """
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.url = f"{self.base_url}{parts.path}" + (f"?{parts.query}" if parts.query else "")
+        return super().send(request, **kwargs)
+
+
+def install_redirect(base_url):
+    """Routes the shared session of bitcoin_data to the stand-in server.
+
+    Must be called again after bitcoin_data.configure_session, which rebuilds the session.
+    """
+    from bitcoin_data import get_session, HOST_POOL_SIZES, POOL_MAXSIZE
+    session = get_session()
+    for host in UPSTREAM_HOSTS:
+        size = HOST_POOL_SIZES.get(host, POOL_MAXSIZE)
+        session.mount(host, RedirectAdapter(base_url, pool_connections=1, pool_maxsize=size, max_retries=0))
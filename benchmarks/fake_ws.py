@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Local stand-in for the mempool.space WebSocket feed used by live_stream.py.
+
+The server accepts WebSocket connections, waits for the "want" subscription, replays
+messages of the same shape as mempool.space (the initial blocks, mempool statistics with
+fees, new blocks) and then drops the connection, so the parsing, the reconnect backoff
+and the fallback to polling can be exercised offline:
+
+    server = FakeStreamServer(drop_after=3)
+    server.start()
+    stream = MempoolStream(on_update, on_state, url=server.url)
+    ...
+    server.stop()
+
+Run as a script it connects a MempoolStream and prints what the widget would see:
+
+    python benchmarks/fake_ws.py --duration 10 --drop-after 3
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+HANDSHAKE_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"  # Fixed by RFC 6455
+OPCODE_TEXT, OPCODE_CLOSE, OPCODE_PING, OPCODE_PONG = 0x1, 0x8, 0x9, 0xA
+
+
+def stream_messages(height=850_123, count=10):
+    """Returns the messages mempool.space sends after a "want" for blocks and stats.
+
+    The list starts with the recent blocks and alternates mempool statistics with new
+    blocks. A message without updates and one that is not JSON are mixed in, since the
+    real feed also sends messages the widget ignores.
+    """
+    now = int(time.time())
+    messages = [{"blocks": [{"height": height - i, "timestamp": now - 600 * i, "tx_count": 3_000} for i in range(8)]}]
+    for i in range(count):
+        if i % 3 == 2:
+            height += 1
+            messages.append({"block": {"height": height, "timestamp": now, "tx_count": 3_100}})
+        else:
+            messages.append({
+                "mempoolInfo": {"size": 45_678 + 100 * i, "bytes": 31_000_000, "usage": 190_000_000},
+                "vBytesPerSecond": 1_800,
+                "fees": {"fastestFee": 12 + i, "halfHourFee": 8, "hourFee": 5, "economyFee": 3, "minimumFee": 1},
+            })
+    messages.insert(2, {"loadingIndicators": {}})
+    encoded = [json.dumps(message) for message in messages]
+    encoded.insert(4, "not json")
+    return encoded
+
+
+def encode_frame(payload, opcode=OPCODE_TEXT):
+    """Returns an unmasked server frame."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack(">BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack(">BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def read_exactly(connection, size):
+    data = b""
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("client went away")
+        data += chunk
+    return data
+
+
+def read_frame(connection):
+    """Reads one masked client frame and returns (opcode, payload)."""
+    first, second = read_exactly(connection, 2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", read_exactly(connection, 2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", read_exactly(connection, 8))[0]
+    mask = read_exactly(connection, 4) if second & 0x80 else b"\0\0\0\0"
+    payload = read_exactly(connection, length)
+    return first & 0x0F, bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+
+
+class FakeStreamServer:
+    def __init__(self, messages=None, interval=0.2, drop_after=None):
+        """Initializes the stand-in server.
+
+        Args:
+            messages (list, optional): The text messages sent after the subscription.
+                Defaults to stream_messages().
+            interval (float): Seconds between messages.
+            drop_after (int, optional): Messages after which the connection is dropped
+                without a close frame, like a lost network. By default it is dropped once
+                all messages were sent.
+        """
+        self.messages = messages if messages is not None else stream_messages()
+        self.interval = interval
+        self.drop_after = drop_after
+        self.connections = 0  # Connections accepted so far
+        self.open = 0  # Connections open right now
+        self.subscriptions = []  # The "want" messages received
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.socket = None
+
+    @property
+    def url(self):
+        host, port = self.socket.getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    def start(self):
+        """Starts serving on a free local port in a background thread."""
+        self.socket = socket.create_server(("127.0.0.1", 0))
+        self.socket.settimeout(0.2)  # Checks for stop between accepts
+        threading.Thread(target=self.serve, name="fake-ws", daemon=True).start()
+
+    def stop(self):
+        """Stops accepting and ends the open connections."""
+        self.stopped.set()
+        if self.socket is not None:
+            self.socket.close()
+            self.socket = None
+
+    def serve(self):
+        while not self.stopped.is_set():
+            try:
+                connection, _ = self.socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return  # Stopped
+            threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+    def handle(self, connection):
+        """Answers the handshake, replays the messages and drops the connection."""
+        with self.lock:
+            self.connections += 1
+            self.open += 1
+        try:
+            request = b""
+            while b"\r\n\r\n" not in request:
+                chunk = connection.recv(4096)
+                if not chunk:
+                    return
+                request += chunk
+            key = next(line.split(b":", 1)[1].strip() for line in request.split(b"\r\n")
+                       if line.lower().startswith(b"sec-websocket-key:"))
+            accept = base64.b64encode(hashlib.sha1(key + HANDSHAKE_GUID).digest())
+            connection.sendall(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                               b"Connection: Upgrade\r\nSec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+
+            opcode, payload = read_frame(connection)  # The subscription, sent on open
+            if opcode == OPCODE_TEXT:
+                with self.lock:
+                    self.subscriptions.append(json.loads(payload))
+            connection.settimeout(self.interval)
+            limit = len(self.messages) if self.drop_after is None else self.drop_after
+            for message in self.messages[:limit]:
+                if self.stopped.is_set():
+                    break
+                connection.sendall(encode_frame(message.encode()))
+                try:
+                    opcode, payload = read_frame(connection)  # Waits up to interval for pings or a close
+                except socket.timeout:
+                    continue
+                if opcode == OPCODE_PING:
+                    connection.sendall(encode_frame(payload, OPCODE_PONG))
+                elif opcode == OPCODE_CLOSE:
+                    connection.sendall(encode_frame(payload, OPCODE_CLOSE))
+                    break
+        except (OSError, ConnectionError, StopIteration, ValueError):
+            pass  # The client went away or sent something this stand-in does not handle
+        finally:
+            connection.close()
+            with self.lock:
+                self.open -= 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a MempoolStream against the local WebSocket stand-in.")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run")
+    parser.add_argument("--interval", type=float, default=0.2, help="seconds between messages")
+    parser.add_argument("--drop-after", type=int, default=4, help="messages after which the connection drops")
+    parser.add_argument("--reconnect-delay", type=float, default=0.5, help="first reconnect delay instead of the real one")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import live_stream  # Import the stream under test
+    if not live_stream.MempoolStream.available():
+        sys.exit("websocket-client is not installed: pip install websocket-client")
+    live_stream.RECONNECT_BASE_DELAY = args.reconnect_delay  # Keep the backoff short for the demo
+
+    server = FakeStreamServer(interval=args.interval, drop_after=args.drop_after)
+    server.start()
+    started = time.monotonic()
+    log = lambda text: print(f"{time.monotonic() - started:6.2f}s  {text}", flush=True)
+    updates = []
+    states = []
+
+    def on_update(update):
+        updates.append(update)
+        log(f"update {update}")
+
+    def on_state(connected):
+        states.append(connected)
+        log("connected, polling of the streamed sources paused" if connected else "dropped, polling resumes")
+
+    stream = live_stream.MempoolStream(on_update, on_state, url=server.url)
+    stream.start()
+    time.sleep(args.duration)
+    stream.stop()
+    time.sleep(args.interval)  # Let the server notice the close
+    server.stop()
+
+    print(f"\nconnections: {server.connections}, reconnects: {states.count(False)}, updates: {len(updates)}, "
+          f"open after stop: {server.open}, subscriptions: {server.subscriptions[:1]}")
+
+
+if __name__ == "__main__":
+    main()
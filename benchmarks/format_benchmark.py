@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Measures the cost of formatting one snapshot for display.
+
+Runs offline on a synthetic snapshot, so the numbers only depend on the formatting code:
+
+    python benchmarks/format_benchmark.py
+"""
+
+import locale
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bitcoin_data import format_data, format_market_data, SourceResult  # Import the formatting pipeline
+from data_processing import process_data  # Import the row rendering
+
+MARKET = {
+    'current_price': 61234.56, 'price_change_percentage_24h': -1.23456, 'market_cap': 1_210_000_000_000,
+    'high_24h': 62000.1, 'low_24h': 60000.9, 'circulating_supply': 19_750_000, 'total_volume': 30_000_000_000,
+    'ath': 69000, 'ath_change_percentage': -11.2, 'ath_date': '2021-11-10T14:24:11.849Z',
+}
+RESULTS = {
+    'market': SourceResult({'eur': MARKET}, time.time()),
+    'fees': SourceResult({'fastestFee': 12, 'halfHourFee': 8, 'hourFee': 5}, time.time()),
+    'block_height': SourceResult(850_123, time.time()),
+    'hashrate': SourceResult(610_123.4, time.time()),
+    'unconfirmed_tx': SourceResult(45_678, time.time()),
+}
+
+
+def legacy_format(market):
+    """The previous formatting, with locale.format_string and chained replaces, as a baseline."""
+    price = "{:,.0f}".format(market['current_price']).replace(",", "X").replace(".", ",").replace("X", ".")
+    fields = [price] + ["{:,.0f}".format(market[key]).replace(",", ".") for key in ('high_24h', 'low_24h', 'market_cap', 'total_volume', 'circulating_supply', 'ath')]
+    fields += [locale.format_string('%d', value, grouping=True) for value in (850_123, 610_123, 45_678, 5, 8, 12)]
+    fields += [f"{market['price_change_percentage_24h']:.3f}".replace('.', ','), f"{5.952:.3f}".replace('.', ',')]
+    return fields
+
+
+def measure(name, function, number):
+    """Prints the mean time of a call in microseconds, best of five runs."""
+    best = min(timeit.repeat(function, number=number, repeat=5)) / number
+    print(f"{name:<34} {best * 1e6:8.2f} µs")
+
+
+def main():
+    locale.setlocale(locale.LC_ALL, '')
+    print(f"Locale: {locale.setlocale(locale.LC_NUMERIC)}")
+    measure("legacy formatting (all fields)", lambda: legacy_format(MARKET), 20000)
+    measure("format_data (all fields)", lambda: format_data(RESULTS, 'eur'), 20000)
+    measure("  of which market data", lambda: format_market_data(MARKET, 'eur'), 20000)
+    data = format_data(RESULTS, 'eur')
+    measure("process_data", lambda: process_data(data), 20000)
+    measure("format_data + process_data", lambda: process_data(format_data(RESULTS, 'eur')), 20000)
+
+
+if __name__ == "__main__":
+    main()
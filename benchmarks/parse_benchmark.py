@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Measures the bytes downloaded and the parse time of the hashrate and mempool payloads.
+
+Runs offline on the payloads of benchmarks/fake_api.py. For each payload it compares
+parsing the whole JSON document, the way the getters did before, with reading only the
+needed field, and with reusing the value of an unchanged payload:
+
+    python benchmarks/parse_benchmark.py
+    python benchmarks/parse_benchmark.py --samples 1000 --buckets 2000
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bitcoin_data  # Import the response parsing of the getters
+from bitcoin_data import HASHRATE_URL, UNCONFIRMED_TX_URL, parse_response  # Import the shared parse path
+from lean_json import number_fields  # Import the single field reader
+from fee_distribution import FeeHistogram, summarize  # Import the fee distribution rows
+from fake_api import hashrate_payload, mempool_blocks_payload, mempool_payload  # Import the payloads of the local stand-in
+
+
+class Payload:
+    def __init__(self, content):
+        """Initializes a stand-in for requests.Response holding a payload."""
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def measure(function, number):
+    """Returns the mean time of a call in microseconds, best of five runs."""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parsing of the hashrate and mempool payloads.")
+    parser.add_argument("--samples", type=int, default=7, help="hashrate and difficulty samples in the hashrate payload")
+    parser.add_argument("--buckets", type=int, default=300, help="entries of the mempool fee histogram")
+    parser.add_argument("--number", type=int, default=2000, help="calls per timing")
+    args = parser.parse_args()
+
+    sources = [
+        ("hashrate", HASHRATE_URL, json.dumps(hashrate_payload(time.time(), args.samples)).encode(), "currentHashrate"),
+        ("unconfirmed_tx", UNCONFIRMED_TX_URL, json.dumps(mempool_payload(args.buckets)).encode(), "count"),
+    ]
+    print(f"{'source':<16}{'bytes':>10}{'gzip':>10}{'full parse':>14}{'lean':>12}{'unchanged':>12}")
+    totals = [0, 0, 0.0, 0.0, 0.0]
+    for name, url, content, field in sources:
+        full = measure(lambda: json.loads(content)[field], args.number)
+        lean = measure(lambda: number_fields(content, [field])[field], args.number)
+
+        # An unchanged payload arrives as a new response with the same bytes
+        parse = lambda response: number_fields(response.content, [field])[field]
+        parse_response(url, Payload(content), name, parse)
+        unchanged = measure(lambda: parse_response(url, Payload(content), name, parse), args.number)
+        bitcoin_data._parsed.clear()
+
+        row = [len(content), len(gzip.compress(content)), full, lean, unchanged]
+        totals = [total + value for total, value in zip(totals, row)]
+        print(f"{name:<16}{row[0]:>10}{row[1]:>10}{full:>11.1f} µs{lean:>9.1f} µs{unchanged:>9.1f} µs")
+    print(f"{'per refresh':<16}{totals[0]:>10}{totals[1]:>10}{totals[2]:>11.1f} µs{totals[3]:>9.1f} µs{totals[4]:>9.1f} µs")
+    print("\nbytes and gzip are per download; a payload that is still fresh in the response cache, "
+          "or answered with 304, is not downloaded at all.")
+
+    # The fee distribution rows parse the whole histogram, then work on its columns
+    buckets = mempool_payload(args.buckets)['fee_histogram']
+    blocks = mempool_blocks_payload()
+    print(f"\nfee distribution of {len(buckets)} buckets: {measure(lambda: summarize(FeeHistogram(buckets), blocks), args.number):.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
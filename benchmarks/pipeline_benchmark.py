@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Benchmarks the refresh pipeline offline against a local stand-in of the APIs.
+
+Every iteration runs get_formatted_data -> process_data -> update_labels, the same path a
+refresh takes in the widget, with the shared HTTP session routed to benchmarks/fake_api.py.
+The scenarios compare sequential and concurrent fetching, cold and warm response caches
+and several failure modes. Results are written as JSON, so two commits can be compared:
+
+    python benchmarks/pipeline_benchmark.py --output before.json
+    python benchmarks/pipeline_benchmark.py --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")  # No display needed
+
+import bitcoin_data  # Import the fetch pipeline
+from bitcoin_data import SOURCES, SourceResult, format_data, get_formatted_data, response_cache  # Import the pipeline stages
+from bitcoin_data import HOST_RATE_LIMITS, request_governor  # Import the per-host request budgets
+from data_processing import process_data  # Import the row rendering
+from resilience import reset_circuit_breakers  # Import the breaker reset between scenarios
+from fake_api import FakeApiServer, install_redirect  # Import the local stand-in of the APIs
+
+# Scenarios: server settings, fetch mode, whether the cache is cleared before each iteration, client timeout
+# and whether the request budgets of HOST_RATE_LIMITS apply. Deferrals after a 429 always apply.
+SCENARIOS = {
+    "concurrent_cold": dict(server={}, mode="concurrent", cold=True),
+    "sequential_cold": dict(server={}, mode="sequential", cold=True),
+    "concurrent_warm": dict(server={}, mode="concurrent", cold=False),
+    "slow_upstream": dict(server={"latency": 0.3}, mode="concurrent", cold=True),
+    "errors_20pct": dict(server={"error_rate": 0.2}, mode="concurrent", cold=True),
+    "timeouts_10pct": dict(server={"timeout_rate": 0.1, "hang": 2.0}, mode="concurrent", cold=True, timeout=0.5),
+    "rate_limited_10pct": dict(server={"rate_limit_rate": 0.1, "retry_after": 1}, mode="concurrent", cold=True),
+    "paced": dict(server={}, mode="concurrent", cold=True, paced=True),
+}
+
+
+def fetch_sequential(currency):
+    """Fetches every source one after the other, the way the widget did before fetch_all."""
+    results = {}
+    for name, getter in SOURCES.items():
+        try:
+            results[name] = SourceResult(getter(), time.time())
+        except Exception as e:
+            results[name] = SourceResult(error=str(e))
+    return format_data(results, currency)
+
+
+def make_renderer():
+    """Returns a function that updates the widget's labels, or None if PyQt5 is not installed."""
+    try:
+        from PyQt5.QtWidgets import QApplication
+        from PyQt5.QtGui import QColor
+        from ui_components import UIComponents
+    except ImportError:
+        return None
+    app = QApplication.instance() or QApplication([])
+    components = UIComponents(QColor(255, 255, 255), 10)
+
+    def render(processed_data):
+        components.update_labels(processed_data)
+        app.processEvents()
+    return render
+
+
+def percentile(sorted_values, share):
+    """Returns the value below which the given share of the sorted values lies."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(share * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(server, name, scenario, iterations, render, currency):
+    """Runs one scenario and returns its statistics."""
+    server.configure(latency=0.05, jitter=0.5, error_rate=0.0, timeout_rate=0.0, hang=30.0, rate_limit_rate=0.0, retry_after=1)
+    server.configure(**scenario["server"])
+    bitcoin_data.configure_session(timeout=scenario.get("timeout", 10))
+    install_redirect(server.base_url)
+    reset_circuit_breakers()
+    request_governor.reset(HOST_RATE_LIMITS if scenario.get("paced") else {})  # The stand-in needs no pacing
+    response_cache.clear()
+    fetch = fetch_sequential if scenario["mode"] == "sequential" else get_formatted_data
+
+    latencies, failed_fields = [], 0
+    requests_before, bytes_before = server.requests, server.bytes_sent
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        if scenario["cold"]:
+            response_cache.clear()
+        begin = time.perf_counter()
+        data = fetch(currency)
+        processed_data = process_data(data)
+        if render and processed_data:
+            render(processed_data)
+        latencies.append(time.perf_counter() - begin)
+        failed_fields += sum(1 for text in (processed_data or {}).values() if text.startswith("Error"))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "throughput_per_s": iterations / elapsed,
+        "peak_memory_kib": peak / 1024,
+        "requests": server.requests - requests_before,
+        "bytes_received": server.bytes_sent - bytes_before,
+        "error_rows": failed_fields,
+    }
+
+
+def git_commit():
+    """Returns the current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Prints the change of the p50 and p95 latency against an earlier result file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["scenarios"]
+    print(f"\nCompared with {baseline_path}:")
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        changes = [f"{key} {(stats[key] / before[key] - 1) * 100:+.1f} %" for key in ("p50_ms", "p95_ms") if before[key]]
+        print(f"  {name:<18} " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the refresh pipeline against a local fake API server.")
+    parser.add_argument("--iterations", type=int, default=30, help="iterations per scenario")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only this scenario, can be repeated")
+    parser.add_argument("--currency", default="eur")
+    parser.add_argument("--no-render", action="store_true", help="skip updating the Qt labels")
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    parser.add_argument("--compare", default=None, help="earlier JSON results to compare with")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)  # process_data reads settings.json from here
+    render = None if args.no_render else make_renderer()
+    server = FakeApiServer(seed=1)
+    server.start()
+    results = {}
+    try:
+        for name in args.scenario or SCENARIOS:
+            results[name] = stats = run_scenario(server, name, SCENARIOS[name], args.iterations, render, args.currency)
+            print(f"{name:<18} p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  p99 {stats['p99_ms']:8.1f} ms  "
+                  f"{stats['throughput_per_s']:6.2f}/s  peak {stats['peak_memory_kib']:8.1f} KiB  {stats['requests']} requests")
+    finally:
+        server.stop()
+
+    report = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "render": render is not None,
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Measures the cold start of the widget: import time and time to first paint.
+
+Each run starts a fresh interpreter, so nothing is cached between runs apart from the
+operating system's file cache. Two numbers are taken per run:
+
+- import: the cumulative time of `import biwi` as reported by `python -X importtime`
+- first paint: the wall time from launching the interpreter until the widget receives
+  its first paint event, with the Qt offscreen platform
+
+The first paint run also lists which of the lazily loaded modules were already imported
+at that point. Results can be written as JSON and compared with an earlier run:
+
+    python benchmarks/startup_benchmark.py --output before.json
+    python benchmarks/startup_benchmark.py --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported once they are needed
+LAZY_MODULES = ("requests", "websocket", "settings_dialog", "custom_context_menu", "info")
+
+# Runs in the child interpreter, prints the seconds since launch at the first paint as JSON
+FIRST_PAINT_SCRIPT = """
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+from PyQt5.QtCore import QEvent, QObject
+from PyQt5.QtWidgets import QApplication
+import biwi
+
+class PaintWatcher(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            elapsed = time.time() - {launched!r}
+            loaded = [name for name in {lazy!r} if name in sys.modules]
+            print(json.dumps({{"first_paint": elapsed, "loaded": loaded}}), flush=True)
+            os._exit(0)  # Skip saving settings and stopping threads, nothing was changed
+        return False
+
+app = QApplication(sys.argv)
+window = biwi.RoundedWidget()
+watcher = PaintWatcher()
+window.installEventFilter(watcher)
+window.show()
+app.exec_()
+"""
+
+
+def child_env():
+    """Returns the environment of the child interpreters, offscreen and without bytecode writes."""
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")  # No display needed
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def measure_import():
+    """Returns the cumulative seconds of `import biwi` in a fresh interpreter."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import biwi"],
+                            cwd=ROOT, env=child_env(), capture_output=True, text=True, check=True)
+    for line in result.stderr.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) == 3 and parts[2] == "biwi":
+            return int(parts[1]) / 1_000_000  # Microseconds
+    raise RuntimeError("import time of biwi not found in the output")
+
+
+def measure_first_paint(timeout):
+    """Returns the seconds from launch to the first paint and the lazy modules loaded by then."""
+    launched = time.time()
+    script = FIRST_PAINT_SCRIPT.format(root=ROOT, launched=launched, lazy=LAZY_MODULES)
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=child_env(),
+                            capture_output=True, text=True, timeout=timeout)
+    for line in result.stdout.splitlines():
+        if line.startswith("{"):
+            report = json.loads(line)
+            return report["first_paint"], report["loaded"]
+    raise RuntimeError(f"the widget was not painted: {result.stderr.strip()[-500:]}")
+
+
+def summarize(values):
+    """Returns the median, minimum and maximum of a list of seconds in milliseconds."""
+    return {
+        "median_ms": statistics.median(values) * 1000,
+        "min_ms": min(values) * 1000,
+        "max_ms": max(values) * 1000,
+    }
+
+
+def git_commit():
+    """Returns the current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Prints the change of the medians against an earlier result file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    print(f"\nCompared with {baseline_path}:")
+    for name, stats in results.items():
+        before = baseline.get(name)
+        if before and before["median_ms"]:
+            print(f"  {name:<12} median {(stats['median_ms'] / before['median_ms'] - 1) * 100:+.1f} %")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the import time and the time to first paint of the widget.")
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters per measurement")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for the first paint")
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    parser.add_argument("--compare", default=None, help="earlier JSON results to compare with")
+    args = parser.parse_args()
+
+    imports, paints, loaded = [], [], set()
+    for _ in range(args.runs):
+        imports.append(measure_import())
+        first_paint, modules = measure_first_paint(args.timeout)
+        paints.append(first_paint)
+        loaded.update(modules)
+
+    results = {"import": summarize(imports), "first_paint": summarize(paints)}
+    for name, stats in results.items():
+        print(f"{name:<12} median {stats['median_ms']:8.1f} ms  min {stats['min_ms']:8.1f} ms  max {stats['max_ms']:8.1f} ms")
+    print("Loaded before the first paint: " + (", ".join(sorted(loaded)) or "none of " + ", ".join(LAZY_MODULES)))
+
+    report = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "runs": args.runs,
+        "results": results,
+        "loaded_before_first_paint": sorted(loaded),
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
-import requests
 import time  # For delay between retry attempts
-import locale
-from requests.exceptions import HTTPError
-from currencies import currencies, currency_symbols  # Import currency data
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait  # For fetching all sources at once
+from currencies import currencies  # Import currency data
+from formatting import get_snapshot_formatter  # Import the cached display formatters
+from metrics import METRICS  # Import the registry of displayed metrics
+from response_cache import ResponseCache  # Import the per-endpoint response cache
+from resilience import backoff_delay, circuit_breaker_for  # Import retry and circuit breaker helpers
+from governor import RequestGovernor, parse_retry_after  # Import the per-host request budget
+from lean_json import number_fields  # Import the reader of single fields of large payloads
+from fee_distribution import FeeHistogram, summarize  # Import the fee percentiles and confirmation estimates
+from urllib.parse import urlsplit
+import instrumentation  # Import the optional timing spans and counters
 
 # Constants for APIs
 CURRENCY = "eur"  # Default currency set to Euro
@@ -10,169 +18,494 @@ BITCOIN_ID = "bitcoin"  # Bitcoin ID for API requests
 URL_BLOCK = "https://mempool.space/api/blocks/tip/height"  # URL to get the latest block height
 HASHRATE_URL = "https://mempool.space/api/v1/mining/hashrate/1w"  # URL to get the hashrate
 UNCONFIRMED_TX_URL = "https://mempool.space/api/mempool"  # URL to get unconfirmed transactions
+FEES_URL = "https://mempool.space/api/v1/fees/recommended"  # URL to get the recommended fees
+MEMPOOL_BLOCKS_URL = "https://mempool.space/api/v1/fees/mempool-blocks"  # URL to get the projected blocks
+# URL to get the Bitcoin market data in all currencies with a single request
+MARKET_DATA_URL = f"https://api.coingecko.com/api/v3/coins/{BITCOIN_ID}?localization=false&tickers=false&community_data=false&developer_data=false&sparkline=false"
+REFRESH_DEADLINE = 20  # Seconds a whole refresh may take before unfinished sources are given up
+CHANGE_WINDOW = 24 * 60 * 60  # Seconds covered by the price change
 
-# Automatically set the locale for formatting, this is crucial for correct number formatting
-locale.setlocale(locale.LC_ALL, '')
+# Connection pooling for the shared HTTP session
+REQUEST_TIMEOUT = 10  # Seconds to wait for a single request
+RETRY_MAX_DELAY = 8  # Longest backoff between two attempts of a request
+POOL_MAXSIZE = 2  # Keep-alive connections per host that is not listed below
+HOST_POOL_SIZES = {  # Keep-alive connections per host, enough for its concurrent requests
+    "https://mempool.space": 4,
+    "https://api.coingecko.com": 1,
+}
+
+# Request budget per host as (requests per second, burst), below the limits of the free tiers
+HOST_RATE_LIMITS = {
+    "https://api.coingecko.com": (10 / 60, 3),
+    "https://mempool.space": (1, 10),
+}
+RATE_LIMIT_MAX_WAIT = 5  # Seconds a request may wait for its budget before the source is deferred
+RATE_LIMIT_DEFAULT_DELAY = 60  # Seconds to leave a host alone after a 429 without Retry-After
+request_governor = RequestGovernor(HOST_RATE_LIMITS)
+
+_session = None  # Shared requests.Session, created on first use
+_session_lock = threading.Lock()
+
+# Seconds a response stays fresh before the endpoint is asked again
+CACHE_TTLS = {
+    MARKET_DATA_URL: 60,  # Price moves constantly, but double-clicks should not refetch it
+    FEES_URL: 60,
+    MEMPOOL_BLOCKS_URL: 60,
+    UNCONFIRMED_TX_URL: 60,
+    URL_BLOCK: 60,  # A new block arrives about every 10 minutes
+    HASHRATE_URL: 1800,  # The hashrate series is updated rarely
+}
+response_cache = ResponseCache(CACHE_TTLS)
+instrumentation.add_report("response_cache", response_cache.stats)  # Hits and misses on /stats.json
+
+_parsed = {}  # The last parsed response and its value keyed by URL and source
+_parsed_lock = threading.Lock()
+
+# Shared worker pool so every source of a refresh is requested at the same time
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="biwi-fetch")
+
+
+class FetchError(Exception):
+    """Raised by the source getters when their data could not be retrieved."""
+
+
+class RateLimited(FetchError):
+    def __init__(self, url, retry_after):
+        """Initializes the error raised when a host asked to wait or its budget is used up.
+
+        Args:
+            url (str): The URL that was not requested.
+            retry_after (float): Seconds until the host accepts requests again.
+        """
+        super().__init__(f"Rate limited by {urlsplit(url).netloc}, retrying in {retry_after:.0f} seconds.")
+        self.retry_after = retry_after
+
+
+class SourceResult:
+    def __init__(self, value=None, fetched_at=None, error=None, stale=False, retry_after=None):
+        """Initializes the result of fetching one data source.
+
+        Args:
+            value: The fetched value, or the last good value if the source is stale.
+            fetched_at (float, optional): When the value was fetched.
+            error (str, optional): Why the last fetch failed, None if it succeeded.
+            stale (bool): Whether the value is left over from an earlier fetch.
+            retry_after (float, optional): Seconds until the source may be fetched again,
+                set if it was deferred by rate limiting instead of failing.
+        """
+        self.value = value
+        self.fetched_at = fetched_at
+        self.error = error
+        self.stale = stale
+        self.retry_after = retry_after
+
+    @property
+    def ok(self):
+        """Whether the last fetch of the source succeeded."""
+        return self.error is None
+
+    @property
+    def usable(self):
+        """Whether there is a value to show, fresh or stale."""
+        return self.value is not None
+
+    def to_dict(self):
+        """Returns the result as a JSON serializable dictionary."""
+        return {'value': self.value, 'fetched_at': self.fetched_at, 'error': self.error, 'stale': self.stale,
+                'retry_after': self.retry_after}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Creates a result from the output of to_dict."""
+        return cls(data.get('value'), data.get('fetched_at'), data.get('error'), data.get('stale', False), data.get('retry_after'))
+
+    def __repr__(self):
+        return (f"SourceResult(value={self.value!r}, fetched_at={self.fetched_at!r}, error={self.error!r}, "
+                f"stale={self.stale!r}, retry_after={self.retry_after!r})")
+
+def configure_session(pool_maxsize=None, host_pool_sizes=None, timeout=None):
+    """Changes the connection pool sizes and timeout of the shared HTTP session.
+
+    The current session is closed and rebuilt with the new limits on its next use.
+
+    Args:
+        pool_maxsize (int, optional): Keep-alive connections for hosts without their own limit.
+        host_pool_sizes (dict, optional): Keep-alive connections keyed by scheme and host.
+        timeout (float, optional): Seconds to wait for a single request.
+    """
+    global _session, POOL_MAXSIZE, HOST_POOL_SIZES, REQUEST_TIMEOUT
+    with _session_lock:
+        if pool_maxsize is not None:
+            POOL_MAXSIZE = pool_maxsize
+        if host_pool_sizes is not None:
+            HOST_POOL_SIZES = dict(host_pool_sizes)
+        if timeout is not None:
+            REQUEST_TIMEOUT = timeout
+        if _session is not None:
+            _session.close()
+            _session = None
+
+def get_session():
+    """Returns the shared HTTP session, creating it on first use.
+
+    Every host gets its own connection pool, so connections are kept alive and
+    reused across refreshes instead of doing a new TCP and TLS handshake each time.
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            # requests is imported on first use, it makes up most of the import time of the widget
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_maxsize=POOL_MAXSIZE, pool_block=True))
+            for host, pool_size in HOST_POOL_SIZES.items():
+                # pool_block limits the open connections to the pool size of the host
+                session.mount(host, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True))
+            _session = session
+        return _session
 
 # Retry mechanism to handle potential network errors
-def get_with_retries(url, retries=2, delay=10):
+def get_with_retries(url, retries=2, delay=1):
+    """Requests a URL, retrying with exponential backoff and jitter.
+
+    A retry is only made if it can still finish within REFRESH_DEADLINE, so a failure
+    that took long, like a timeout, is retried by the scheduler's backoff instead.
+    Hosts that keep failing are skipped right away by their circuit breaker until
+    their cooldown is over, so an offline upstream does not cost a timeout per refresh.
+    Every request also goes through the request governor: identical requests in flight
+    share one response, and each host is paced by its budget in HOST_RATE_LIMITS.
+
+    Args:
+        url (str): The URL to request.
+        retries (int): The number of attempts.
+        delay (float): The upper bound of the first backoff wait in seconds.
+
+    Returns:
+        requests.Response: The response, or None if all attempts failed.
+
+    Raises:
+        RateLimited: If the host's budget is used up or it answered 429 for longer than
+            RATE_LIMIT_MAX_WAIT. The request is not sent, the caller should try again later.
+    """
+    host = urlsplit(url).netloc if instrumentation.is_enabled() else None  # Label of the recorded values
+    cached = response_cache.get_fresh(url)
+    if cached is not None:
+        instrumentation.increment("cache_hits", host=host)
+        return cached  # Still fresh, no network traffic needed
+    return request_governor.coalesce(url, lambda: _request_with_retries(url, retries, delay, host))
+
+def _request_with_retries(url, retries, delay, host):
+    """Sends the attempts of get_with_retries, each within the budget of the host."""
+    from requests.exceptions import RequestException  # Loaded with the session on the first request
+
+    breaker = circuit_breaker_for(url)
+    if not breaker.allow_request():
+        instrumentation.increment("circuit_open_skips", host=host)
+        return None  # The host is cooling down after repeated failures
+
+    started = time.monotonic()
+
+    def in_time(wait):
+        """Returns whether another attempt after a wait, including its budget wait, ends before the refresh deadline."""
+        return time.monotonic() - started + wait + RATE_LIMIT_MAX_WAIT + REQUEST_TIMEOUT <= REFRESH_DEADLINE
+
     for attempt in range(retries):
+        wait = request_governor.acquire(url, RATE_LIMIT_MAX_WAIT)
+        if wait:
+            instrumentation.increment("rate_limit_deferrals", host=host)
+            raise RateLimited(url, wait)  # Out of budget, defer instead of queueing for long
         try:
-            # Attempt to get the response from the API
-            response = requests.get(url, timeout=10)  # Set a timeout of 10 seconds for the request
+            # Attempt to get the response from the API over a pooled connection,
+            # letting the server answer 304 if the cached copy is still valid
+            with instrumentation.span("http_request", host=host):
+                response = get_session().get(url, timeout=REQUEST_TIMEOUT, headers=response_cache.conditional_headers(url))
+            instrumentation.increment("http_responses", host=host, status=response.status_code)
+            if response.status_code == 429:
+                # The host is healthy but wants fewer requests, so the breaker is left alone
+                retry_after = parse_retry_after(response.headers.get("Retry-After"), RATE_LIMIT_DEFAULT_DELAY)
+                print(f"Error: {urlsplit(url).netloc} is rate limiting, pausing it for {retry_after:.0f} seconds.")
+                request_governor.defer(url, retry_after)
+                if in_time(0):
+                    continue  # The next attempt waits for the deferral or gives up
+                break
+            if response.status_code == 304:
+                breaker.record_success()
+                instrumentation.increment("cache_revalidations", host=host)
+                return response_cache.revalidate(url)  # Reuse the cached body
             response.raise_for_status()  # Raise an error for HTTP error codes
+            breaker.record_success()
+            instrumentation.increment("bytes_received", len(response.content), host=host)
+            response_cache.store(url, response)
             return response  # Return the response if successful
-        except (HTTPError, requests.exceptions.Timeout) as e:
-            if attempt < retries - 1:
-                # If there's an error, print it and wait before retrying
-                print(f"Error: {e}, retrying in {delay} seconds...")
-                time.sleep(delay)  # Wait time before retrying
+        except RequestException as e:  # HTTP errors, timeouts and connection errors
+            breaker.record_failure()
+            instrumentation.increment("http_failures", host=host, error=type(e).__name__)
+            wait = backoff_delay(attempt, delay, RETRY_MAX_DELAY)
+            if attempt < retries - 1 and in_time(wait) and breaker.allow_request():
+                instrumentation.increment("retries", host=host)
+                # If there's an error, print it and back off before retrying
+                print(f"Error: {e}, retrying in {wait:.1f} seconds...")
+                time.sleep(wait)  # Only blocks this source's pool thread
             else:
                 # Return None if all attempts fail
-                return None  
+                return None
+    raise RateLimited(url, retry_after)  # Every attempt in time was answered with 429
 
-def get_mempool_fees(retries=2, delay=10):
+def parse_response(url, response, source, parse):
+    """Parses a response, reusing the value of the previous one if the payload is the same.
+
+    The response cache hands out the same response object while it is fresh and after a
+    304, and servers without validators often send the same bytes again, so unchanged
+    payloads are parsed only once.
+
+    Args:
+        url (str): The requested URL.
+        response (requests.Response): The response to parse.
+        source (str): The source name, the label of the recorded parse time. Sources
+            that read different fields of the same URL keep their own values.
+        parse (callable): Turns the response into the value of the source.
+
+    Returns:
+        The parsed value, shared with earlier callers if the payload did not change.
+    """
+    with _parsed_lock:
+        last = _parsed.get((url, source))
+    if last is not None and (last[0] is response or last[0].content == response.content):
+        instrumentation.increment("parse_reuses", source=source)
+        return last[1]
+    with instrumentation.span("parse", source=source):
+        value = parse(response)
+    with _parsed_lock:
+        _parsed[(url, source)] = (response, value)
+    return value
+
+def get_mempool_fees(retries=2, delay=1):
     """Fetches recommended mempool fees from the API."""
-    url = 'https://mempool.space/api/v1/fees/recommended'
-    response = get_with_retries(url, retries, delay)
+    response = get_with_retries(FEES_URL, retries, delay)
     if response:
-        return response.json()  # Return the JSON response
-    return f"Error retrieving mempool fees."  # Error message if retrieval fails
+        with instrumentation.span("parse", source="fees"):
+            return response.json()  # Return the JSON response
+    raise FetchError("Error retrieving mempool fees.")  # Error message if retrieval fails
 
-def get_bitcoin_data(currency=CURRENCY, retries=2, delay=10):
-    """Fetches Bitcoin market data based on the specified currency."""
-    url = f'https://api.coingecko.com/api/v3/coins/markets?vs_currency={currency}&ids={BITCOIN_ID}'
-    response = get_with_retries(url, retries, delay)
+def get_market_data(retries=2, delay=1):
+    """Fetches Bitcoin market data for all supported currencies in one request.
+
+    Returns:
+        dict: The market data of each currency in currencies.py keyed by currency.
+
+    Raises:
+        FetchError: If the data could not be retrieved.
+    """
+    response = get_with_retries(MARKET_DATA_URL, retries, delay)
     if response:
-        price_data = response.json()  # Parse the JSON response
-        return price_data[0]  # Return the first object containing Bitcoin data
-    return f"Error retrieving Bitcoin data."  # Error message if retrieval fails
+        return parse_response(MARKET_DATA_URL, response, "market", _parse_market_data)
+    raise FetchError("Error retrieving Bitcoin data.")  # Error message if retrieval fails
+
+def _parse_market_data(response):
+    """Picks the market data of each currency out of a coins/bitcoin response."""
+    market_data = response.json()['market_data']  # Parse the JSON response
+    # Each field holds the values of all currencies, pick them apart per currency
+    return {
+        currency: {
+            'current_price': market_data['current_price'][currency],
+            'price_change_percentage_24h': market_data['price_change_percentage_24h_in_currency'][currency],
+            'market_cap': market_data['market_cap'][currency],
+            'high_24h': market_data['high_24h'][currency],
+            'low_24h': market_data['low_24h'][currency],
+            'circulating_supply': market_data['circulating_supply'],
+            'total_volume': market_data['total_volume'][currency],
+            'ath': market_data['ath'][currency],
+            'ath_change_percentage': market_data['ath_change_percentage'][currency],
+            'ath_date': market_data['ath_date'][currency],
+        }
+        for currency in currencies if currency in market_data['current_price']
+    }
 
-def get_block_height(retries=2, delay=10):
+def get_block_height(retries=2, delay=1):
     """Fetches the current block height from the blockchain."""
     response = get_with_retries(URL_BLOCK, retries, delay)
     if response:
-        return int(response.text)  # Return block height as an integer
-    return f"Error retrieving block height."  # Error message if retrieval fails
+        with instrumentation.span("parse", source="block_height"):
+            return int(response.text)  # Return block height as an integer
+    raise FetchError("Error retrieving block height.")  # Error message if retrieval fails
 
-def get_hashrate(retries=2, delay=10):
+def get_hashrate(retries=2, delay=1):
     """Fetches the current Bitcoin network hashrate."""
     response = get_with_retries(HASHRATE_URL, retries, delay)
     if response:
-        hashrate_data = response.json()  # Parse the JSON response
+        # Only the current value is read, the arrays of samples around it are skipped
+        hashrate = parse_response(HASHRATE_URL, response, "hashrate",
+                                  lambda response: number_fields(response.content, ['currentHashrate'])['currentHashrate'])
         # Convert the hashrate to Exahash/s for easier readability
-        return float(hashrate_data['currentHashrate']) / 1_000_000_000_000_000  
-    return f"Error retrieving hashrate."  # Error message if retrieval fails
+        return float(hashrate) / 1_000_000_000_000_000
+    raise FetchError("Error retrieving hashrate.")  # Error message if retrieval fails
 
-def get_unconfirmed_tx(retries=2, delay=10):
+def get_unconfirmed_tx(retries=2, delay=1):
     """Fetches the number of unconfirmed Bitcoin transactions."""
     response = get_with_retries(UNCONFIRMED_TX_URL, retries, delay)
     if response:
-        unconf_tx_data = response.json()  # Parse the JSON response
-        return unconf_tx_data['count']  # Return the count of unconfirmed transactions
-    return f"Error retrieving unconfirmed transactions."  # Error message if retrieval fails
-
-def format_price(price):
-    """Formats the price for output with proper thousands separator."""
-    return "{:,.0f}".format(price).replace(",", ".")  # Format price with '.' as thousands separator
-
-def format_fees(hour_fee, half_hour_fee, fastest_fee):
-    """Formats different fee values for better readability."""
-    formatted_hour_fee = locale.format_string('%d', hour_fee, grouping=True)
-    formatted_half_hour_fee = locale.format_string('%d', half_hour_fee, grouping=True)
-    formatted_fastest_fee = locale.format_string('%d', fastest_fee, grouping=True)
-    return formatted_hour_fee, formatted_half_hour_fee, formatted_fastest_fee
-
-def format_bitcoin_price(price, currency):
-    """Formats Bitcoin price for output based on the specified currency."""
-    formatted_price = "{:,.0f}".format(price).replace(",", "X").replace(".", ",").replace("X", ".")  # Replaces commas with periods and vice versa for formatting
-    return f"{formatted_price}"
-
-def format_with_thousands_separator(value):
-    """Formats a number with thousands separator for easier readability."""
-    return "{:,.0f}".format(value).replace(",", ".")  # Use '.' as thousands separator
+        # Return the count of unconfirmed transactions, without parsing the fee histogram
+        return parse_response(UNCONFIRMED_TX_URL, response, "unconfirmed_tx",
+                              lambda response: number_fields(response.content, ['count'])['count'])
+    raise FetchError("Error retrieving unconfirmed transactions.")  # Error message if retrieval fails
+
+def get_fee_distribution(retries=2, delay=1):
+    """Fetches the projected blocks and the fee histogram and summarizes the fee market.
+
+    The mempool response is shared with get_unconfirmed_tx through the response cache
+    and the request governor, so it is downloaded once per refresh.
+
+    Returns:
+        dict: The output of fee_distribution.summarize.
+    """
+    blocks_response = get_with_retries(MEMPOOL_BLOCKS_URL, retries, delay)
+    mempool_response = get_with_retries(UNCONFIRMED_TX_URL, retries, delay)
+    if blocks_response and mempool_response:
+        histogram = parse_response(UNCONFIRMED_TX_URL, mempool_response, "fee_histogram",
+                                   lambda response: FeeHistogram(response.json()['fee_histogram']))
+        blocks = parse_response(MEMPOOL_BLOCKS_URL, blocks_response, "mempool_blocks", lambda response: response.json())
+        return summarize(histogram, blocks)
+    raise FetchError("Error retrieving the fee distribution.")  # Error message if retrieval fails
+
+# Getter of each data source, keyed by the name used in the results of fetch_all
+SOURCES = {
+    'market': get_market_data,
+    'fees': get_mempool_fees,
+    'block_height': get_block_height,
+    'hashrate': get_hashrate,
+    'unconfirmed_tx': get_unconfirmed_tx,
+    'fee_distribution': get_fee_distribution,
+}
+
+def fetch_all(sources=None, deadline=REFRESH_DEADLINE):
+    """Fetches data sources concurrently within a single deadline.
+
+    Every source is submitted to the worker pool at once, so the refresh takes as long
+    as the slowest source instead of the sum of all of them. The market data holds all
+    currencies, so switching currency needs no new fetch.
+
+    Args:
+        sources (list, optional): Names of the sources in SOURCES to fetch. Defaults to all.
+        deadline (float): Seconds to wait for all sources together.
+
+    Returns:
+        dict: A SourceResult for each source keyed by its name. Sources that failed or
+        did not finish before the deadline carry an error instead of a value.
+    """
+    futures = {name: _executor.submit(_fetch_source, name) for name in (sources or SOURCES)}
+    done, _ = wait(futures.values(), timeout=deadline)
+
+    results = {}
+    for name, future in futures.items():
+        if future not in done:
+            future.cancel()  # Drop sources that are still queued; running ones finish in the background
+            instrumentation.increment("source_timeouts", source=name)
+            results[name] = SourceResult(error="Timed out.")
+        elif isinstance(future.exception(), RateLimited):
+            results[name] = SourceResult(error=str(future.exception()), retry_after=future.exception().retry_after)
+        elif future.exception() is not None:
+            instrumentation.increment("source_failures", source=name)
+            results[name] = SourceResult(error=str(future.exception()))  # Failed request or unexpected payload
+        else:
+            results[name] = SourceResult(future.result(), time.time())
+    return results
+
+def _fetch_source(name):
+    """Runs the getter of a source, timing it if instrumentation is on."""
+    with instrumentation.span("source_fetch", source=name):
+        return SOURCES[name]()
+
+def merge_results(previous, results):
+    """Merges new results into earlier ones, keeping the last good value of failed sources.
+
+    A source that failed keeps its previous value, marked as stale, so one flaky endpoint
+    does not blank its labels.
+
+    Args:
+        previous (dict): Earlier SourceResult objects keyed by source name, may be None.
+        results (dict): New SourceResult objects keyed by source name.
+
+    Returns:
+        dict: The merged results.
+    """
+    merged = dict(previous or {})
+    for name, result in results.items():
+        last = merged.get(name)
+        if not result.ok and last is not None and last.usable:
+            merged[name] = SourceResult(last.value, last.fetched_at, result.error, stale=True)
+        else:
+            merged[name] = result
+    return merged
 
 def get_formatted_data(currency=CURRENCY):
     """Fetches all required data and returns it formatted for output."""
-    bitcoin_data = get_bitcoin_data(currency)  # Fetch Bitcoin data based on the specified currency
-
-    # Check if bitcoin_data is a dictionary (indicating no error)
-    if isinstance(bitcoin_data, dict):
-        # Fetch additional data needed for output
-        mempool_fees = get_mempool_fees()
-        block_height = get_block_height()
-        hashrate = get_hashrate()
-        unconfirmed_tx = get_unconfirmed_tx()
-
-        # Extract relevant Bitcoin data from the fetched data
-        bitcoin_price = bitcoin_data['current_price']
-        price_change_24h = bitcoin_data['price_change_percentage_24h']
-        market_cap = bitcoin_data['market_cap']
-        high_24h = bitcoin_data['high_24h']
-        low_24h = bitcoin_data['low_24h']
-        circulating_supply = bitcoin_data['circulating_supply']
-        volume_24h = bitcoin_data['total_volume']
-
-        # New All-Time High (ATH) data
-        ath = bitcoin_data['ath']
-        ath_change_percentage = bitcoin_data['ath_change_percentage']
-        ath_date = bitcoin_data['ath_date']
-
-        # Format prices for output
-        formatted_price = format_bitcoin_price(bitcoin_price, currency)
-        formatted_high_24h = format_bitcoin_price(high_24h, currency)
-        formatted_low_24h = format_bitcoin_price(low_24h, currency)
-
-        # Format market cap with thousands separator
-        formatted_market_cap = format_with_thousands_separator(market_cap)
-
-        formatted_volume = format_with_thousands_separator(volume_24h)  # Format volume with thousands separator
-        formatted_circulating_supply = format_price(circulating_supply)  # Format circulating supply for output
-        formatted_ath = format_bitcoin_price(ath, currency)  # Format ATH for output
-
-        # Calculate the number of missing Bitcoins and the percentage of total supply
-        total_bitcoins = 21_000_000  # Total number of Bitcoins that can ever exist
-        missing_bitcoins = total_bitcoins - circulating_supply  # Calculate how many Bitcoins are missing
-        # Calculate percentage of missing Bitcoins, ensuring we do not divide by zero
-        percentage_missing = (missing_bitcoins / total_bitcoins) * 100 if total_bitcoins > 0 else 0  
-
-        # Format the number of missing Bitcoins for output
-        formatted_missing_bitcoins = format_with_thousands_separator(missing_bitcoins)
-
-        # Format the mempool fees if available
-        if mempool_fees:
-            formatted_hour_fee, formatted_half_fee, formatted_fastest_fee = format_fees(
-                mempool_fees.get('hourFee'),
-                mempool_fees.get('halfHourFee'),
-                mempool_fees.get('fastestFee')
-            )
-            fees_output = f"{formatted_hour_fee}·{formatted_half_fee}·{formatted_fastest_fee}"  # Create output string for fees
-
-        # Add currency symbol and currency code for display
-        currency_symbol = currency_symbols[currency]  # Retrieve the currency symbol from currencies.py
-        currency_code = currencies[currency]  # Retrieve the currency code
-
-        return {
-            'formatted_price': formatted_price,
-            'price_change_24h': price_change_24h,
-            'formatted_high_24h': formatted_high_24h,
-            'formatted_low_24h': formatted_low_24h,
-            'block_height': locale.format_string('%d', block_height, grouping=True),  # Format block height for output
-            'hashrate': locale.format_string('%d', int(hashrate), grouping=True) if hashrate else None,  # Format hashrate if available
-            'unconfirmed_tx': locale.format_string('%d', unconfirmed_tx, grouping=True) if unconfirmed_tx else None,  # Format unconfirmed transactions if available
-            'formatted_volume': formatted_volume,
-            'formatted_market_cap': formatted_market_cap,  # Return formatted market cap without conversion
-            'formatted_circulating_supply': formatted_circulating_supply,
-            'formatted_ath': formatted_ath,
-            'ath_change_percentage': ath_change_percentage,
-            'ath_date': ath_date,
-            'formatted_missing_bitcoins': formatted_missing_bitcoins,  # Formatted number of missing Bitcoins
-            'percentage_missing': percentage_missing,  # Percentage of missing Bitcoins
-            'fees_output': fees_output if mempool_fees else "Error retrieving mempool fees.",  # Output fees or error
-            'currency_symbol': currency_symbol,  # Add currency symbol for display
-            'currency_code': currency_code  # Add currency code for display
-        }
-    else:
-        # Return None if there was an error retrieving Bitcoin data
+    return format_data(fetch_all(), currency)  # Fetch all sources at once
+
+def format_data(results, currency=CURRENCY, history=None, metrics=None):
+    """Formats the results of fetch_all for output in the given currency.
+
+    Every metric is formatted on its own, so a failed source only leaves its own
+    fields empty.
+
+    Args:
+        results (dict): SourceResult objects keyed by source name, as returned by fetch_all.
+        currency (str): The currency to format the market data in.
+        history (MetricHistory, optional): Recorded prices to compute the 24h change from.
+            The change of the API is used while the history covers less than 24 hours.
+        metrics (list, optional): The Metric objects to format. Defaults to all of metrics.METRICS.
+
+    Returns:
+        dict: The formatted field of each metric, None if its source has no value,
+        'stale_sources' listing the sources that show an outdated value and the raw
+        market fields. None if no source has a value at all.
+    """
+    values = {name: result.value for name, result in results.items() if result.usable}
+    if not values:
         return None
+    if 'market' in values:
+        values['market'] = values['market'].get(currency)  # The market data of this currency only
+
+    formatter = get_snapshot_formatter(currency)  # Built once per locale and currency
+    formatted_data = {
+        'currency_symbol': formatter.currency_symbol,
+        'currency_code': formatter.currency_code,
+        'stale_sources': [name for name, result in results.items() if result.stale],
+    }
+    for metric in (METRICS if metrics is None else metrics):
+        value = values.get(metric.source)
+        formatted_data[metric.field] = metric.format_value(formatter, metric.extract(value)) if value is not None else None
+
+    # Raw market fields for scripts, and the locally computed change if the history covers 24 hours
+    bitcoin_data = values.get('market')
+    for field in RAW_MARKET_FIELDS:
+        formatted_data[field] = bitcoin_data[field] if bitcoin_data else None
+    if bitcoin_data and history:
+        local_change = history.change_pct(f'price:{currency}', CHANGE_WINDOW)
+        if local_change is not None:
+            formatted_data['price_change_percentage_24h'] = local_change
+            if formatted_data.get('formatted_change_24h') is not None:
+                formatted_data['formatted_change_24h'] = formatter.format_change(local_change)
+    return formatted_data
+
+# Unformatted fields of the market data passed through by format_data
+RAW_MARKET_FIELDS = ('price_change_percentage_24h', 'ath_change_percentage', 'ath_date')
+
+def format_market_data(bitcoin_data, currency):
+    """Formats the market data of one currency for output.
+
+    Args:
+        bitcoin_data (dict): The market data of the currency, one entry of get_market_data.
+        currency (str): The currency of the market data.
 
+    Returns:
+        dict: The formatted field of each market metric.
+    """
+    formatter = get_snapshot_formatter(currency)
+    return {
+        metric.field: metric.format_value(formatter, metric.extract(bitcoin_data))
+        for metric in METRICS if metric.source == 'market'
+    }
@@ -3,22 +3,41 @@
 import sys
 import json
 import os
-from bitcoin_data import get_formatted_data  # Import function to fetch data from an external source
+import time
+import threading
+from bitcoin_data import format_data, merge_results, SourceResult, CHANGE_WINDOW  # Import functions to format fetched data
+from scheduler import PollScheduler  # Import the per-source refresh scheduler
 from data_processing import process_data, handle_error  # Import data processing functions
-from settings_dialog import SettingsDialog
+from metrics import SOURCE_LABELS, visible_metrics, sources_for  # Import the registry of displayed metrics
+from refresh_worker import RefreshWorker  # Import the background refresh worker
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QColorDialog, QInputDialog
 )
 from PyQt5.QtGui import QColor, QPainter
-from PyQt5.QtCore import QTimer, Qt, QPoint
+from PyQt5.QtCore import QTimer, Qt, QPoint, pyqtSignal
 from ui_components import UIComponents  # Import external UI components
-from custom_context_menu import CustomContextMenu  # Import the custom context menu class
 from currencies import currencies  # Import currency data
-from settings_manager import SettingsManager  # Import the SettingsManager class
+from settings_manager import get_settings_manager  # Import the shared SettingsManager
+from snapshot_store import SnapshotStore  # Import the store for the last successful refresh
+from live_stream import MempoolStream, STREAMED_SOURCES  # Import the mempool.space WebSocket feed
+from biwi_daemon import DaemonSubscription  # Import the client of the shared fetch daemon
+from history import MetricHistory, METRICS  # Import the rolling in-memory history
+from history_store import HistoryStore  # Import the SQLite store that keeps the history across restarts
+import instrumentation  # Import the optional timing spans and metrics endpoint
+from alerts import AlertEngine  # Import the alert rules evaluated on every update
+from formatting import init_locale  # Import the locale setup of the number formatters
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
+ALERT_DISPLAY_TIME = 10 * 60 * 1000  # Milliseconds a fired alert stays visible
+
 class RoundedWidget(QWidget):
+    stream_update = pyqtSignal(object)  # Source updates pushed by the WebSocket feed
+    stream_state = pyqtSignal(bool)  # Whether the WebSocket feed is connected
+    daemon_update = pyqtSignal(object)  # Results published by the shared fetch daemon
+    daemon_state = pyqtSignal(bool)  # Whether the widget follows a running daemon
+    alert_fired = pyqtSignal(str)  # Messages of fired alerts, queued from the alert thread
+
     def __init__(self):
         super().__init__()
 
@@ -28,7 +47,7 @@ class RoundedWidget(QWidget):
         self.setGeometry(100, 100, 400, 400)
 
         # Load settings
-        self.settings_manager = SettingsManager()  # Instantiate the SettingsManager
+        self.settings_manager = get_settings_manager()  # Shared with data processing and dialogs
         settings = self.settings_manager.load_settings()  # Load the settings
 
         # Load background color with transparency
@@ -36,6 +55,18 @@ class RoundedWidget(QWidget):
         self.font_color = QColor(*settings["font_color"])  # Font color
         self.font_size = settings["font_size"]  # Font size
         self.currency = settings["currency"]  # Currency
+        self.last_results = None  # Raw results of the last refresh, holding all currencies
+        self.history_store = HistoryStore()  # history.db next to settings.json
+        self.history = MetricHistory(store=self.history_store)  # Recent values, for the locally computed 24h change
+        self.history_store.load_into(self.history, [f"price:{self.currency}", *METRICS])
+        self.backfill_from = self.history_store.last_points([f"price:{self.currency}", "block_height"])  # Read before anything new is recorded
+
+        # Serve timings and counters of the refresh pipeline if a metrics port is configured
+        if settings.get("metrics_port"):
+            try:
+                instrumentation.start_http_server(settings["metrics_port"])
+            except OSError as e:
+                print(f"Error starting the metrics endpoint: {e}")
 
         # Load window position
         if "position" in settings:
@@ -51,21 +82,54 @@ class RoundedWidget(QWidget):
         for label_name, is_visible in settings.get("label_visibility", {}).items():
             if label_name in self.ui_components.output_labels:  # Check if the label exists
                 self.ui_components.output_labels[label_name].setVisible(is_visible)
-
-        # Timer for automatically fetching data
+        self.ui_components.set_sparklines_enabled(settings.get("sparklines", False))
+
+        # Paint the last successful refresh right away, marked as stale until refreshed
+        self.snapshot_store = SnapshotStore()
+        snapshot = self.snapshot_store.load()
+        if snapshot:
+            self.last_results = snapshot["results"]
+            if self.render_from_memory():
+                self.ui_components.set_stale(True, snapshot.get("saved_at"))
+
+        # Worker that fetches the data off the GUI thread
+        self.refresh_worker = RefreshWorker(self.snapshot_store, self.history, self)
+        self.refresh_worker.data_ready.connect(self.on_data_ready)
+
+        # Timer for automatically fetching data, each source on its own adaptive interval
+        self.scheduler = PollScheduler()
+        self.update_enabled_sources()  # Sources of hidden labels are not polled
         self.timer = QTimer(self)
-        self.timer.setInterval(600000)  # 10 minutes in milliseconds
-        self.timer.timeout.connect(self.fetch_data)
-        self.timer.start()
-
-        # Initial data fetch
-        self.fetch_data()
+        self.timer.setSingleShot(True)  # Rearmed for the next due source after every refresh
+        self.timer.timeout.connect(self.poll_due_sources)
+
+        # Live updates over the mempool.space WebSocket, polling takes over while it is down
+        self.stream_update.connect(self.on_stream_update)  # Queued from the stream thread
+        self.stream_state.connect(self.on_stream_state)
+        self.mempool_stream = MempoolStream(self.stream_update.emit, self.stream_state.emit)
+
+        # Follow the shared fetch daemon if one runs, it then does all fetching for this widget
+        self.daemon_connected = False
+        self.daemon_update.connect(self.on_daemon_update)  # Queued from the subscription thread
+        self.daemon_state.connect(self.on_daemon_state)
+        self.daemon_subscription = DaemonSubscription(self.daemon_update.emit, self.daemon_state.emit)
+
+        # Alert rules from settings.json, evaluated off the GUI thread on every update
+        self.alert_fired.connect(self.on_alert)
+        self.alert_engine = AlertEngine(self.alert_fired.emit)
+        self.alert_engine.configure(settings.get("alerts", []), self.currency, settings.get("alert_hook"))
+        self.alert_timer = QTimer(self)
+        self.alert_timer.setSingleShot(True)
+        self.alert_timer.timeout.connect(self.clear_alert)
+
+        # Fetching, streaming and backfilling start once the window is painted
+        self.background_started = False
 
         # Automatically adjust window size
         self.adjustSize()  # Adjust the window size here
 
-        # Initialize context menu
-        self.context_menu = CustomContextMenu(self)  # Create context menu
+        # Context menu, created on first use
+        self.context_menu = None
 
         # Bind the context menu to the custom method
         self.setContextMenuPolicy(Qt.CustomContextMenu)
@@ -81,11 +145,32 @@ class RoundedWidget(QWidget):
         painter.setBrush(self.background_color)  # Use the chosen background color
         painter.setPen(Qt.NoPen)  # No border
         painter.drawRoundedRect(rect, 20, 20)  # Round the corners
+        if not self.background_started:
+            QTimer.singleShot(0, self.start_background_work)  # Start fetching once the first frame is painted
 
     def show_context_menu(self, pos):
         """Displays the context menu at the specified position."""
+        if self.context_menu is None:
+            from custom_context_menu import CustomContextMenu  # Loaded on first use with the dialogs it opens
+            self.context_menu = CustomContextMenu(self)  # Create context menu
         self.context_menu.create_context_menu(pos)  # Show context menu
 
+    def start_background_work(self):
+        """Starts fetching, the live feed, the daemon subscription and the history backfill.
+
+        Runs right after the first paint, so the cached snapshot is on screen before
+        any of this work begins.
+        """
+        if self.background_started:
+            return
+        self.background_started = True
+        self.alert_engine.start()
+        if self.settings_manager.get("live_updates", True):
+            self.mempool_stream.start()
+        self.daemon_subscription.start()
+        self.fetch_data()  # Initial data fetch, runs in the background
+        threading.Thread(target=self.backfill_history, name="biwi-backfill", daemon=True).start()
+
     def mouseDoubleClickEvent(self, event):
         """Updates the data on double-click."""
         self.fetch_data()
@@ -93,12 +178,19 @@ class RoundedWidget(QWidget):
     def set_currency(self, currency):
         """Sets the currency and updates the data."""
         self.currency = currency
-        self.fetch_data()
+        self.history_store.load_into(self.history, [f"price:{currency}"])
+        settings = self.settings_manager.load_settings()
+        self.alert_engine.configure(settings.get("alerts", []), currency, settings.get("alert_hook"))  # Price rules follow the currency
+        self.render_from_memory()
+        market = (self.last_results or {}).get("market")
+        if not (market and market.usable and currency in market.value):
+            self.fetch_data(["market"])  # Fetch only if the last refresh has no data for it
         self.save_settings()
 
     def open_settings(self):
         """Opens the settings dialog and updates visibility."""
-        settings_dialog = SettingsDialog(self.ui_components.output_labels, self)  # Pass the main window
+        from settings_dialog import SettingsDialog  # Loaded on first use
+        settings_dialog = SettingsDialog(self.ui_components.output_labels, self.settings_manager, self)  # Pass the main window
         if settings_dialog.exec_():  # Save only if the dialog is accepted
             self.save_settings()  # Save the current settings if dialog is accepted
         
@@ -110,12 +202,20 @@ class RoundedWidget(QWidget):
             # Adjust window size after visibility changes
             self.adjustSize()  # Adjust the window size
 
+            # Poll only the sources of visible labels, fetching newly shown ones right away
+            self.update_enabled_sources()
+            self.render_from_memory()
+            if not self.refresh_worker.running:
+                self.poll_due_sources()
+
     def change_text_color(self):
         """Changes the font color of all labels."""
         color = QColorDialog.getColor()
         if color.isValid():
-            for label in self.ui_components.output_labels.values():
+            for label in [*self.ui_components.output_labels.values(), self.ui_components.alert_label]:
                 label.setStyleSheet(f"background: transparent; color: {color.name()};")
+            for sparkline in self.ui_components.sparklines.values():
+                sparkline.set_color(color)
             self.font_color = color
             self.save_settings()
 
@@ -137,12 +237,20 @@ class RoundedWidget(QWidget):
             self.update()
             self.save_settings()
 
+    def toggle_sparklines(self):
+        """Shows or hides the sparklines next to Price, Fees and Hashrate."""
+        enabled = not self.settings_manager.get("sparklines", False)
+        self.settings_manager.set("sparklines", enabled)
+        self.ui_components.set_sparklines_enabled(enabled)
+        self.update_sparklines()
+        self.adjustSize()
+
     def change_font_size(self):
         """Changes the font size."""
         font_size, ok = QInputDialog.getInt(self, "Change Font Size", "Select font size:", value=self.ui_components.monospace_font.pointSize(), min=6, max=72)
         if ok:
             self.ui_components.monospace_font.setPointSize(font_size)
-            for label in self.ui_components.output_labels.values():
+            for label in [*self.ui_components.output_labels.values(), self.ui_components.alert_label]:
                 label.setFont(self.ui_components.monospace_font)
                 label.setMinimumSize(0, 0)  # Remove minimum size so the window can be resized
 
@@ -151,18 +259,163 @@ class RoundedWidget(QWidget):
             self.adjustSize()  # Recalculate the window size
             self.save_settings()  # Save the new settings
 
-    def fetch_data(self):
-        """Fetches the Bitcoin data and updates the output."""
-        data = get_formatted_data(self.currency)
-        if data:
-            processed_data = process_data(data)
-            self.ui_components.update_labels(processed_data)  # Update the labels
-
-            # Adjust window size after data update
-            self.ui_components.updateGeometry()  # Recalculate layout
-            self.adjustSize()  # Recalculate the window size
+    def fetch_data(self, sources=None):
+        """Starts a background refresh of the Bitcoin data.
+
+        Sources that no visible label needs are never fetched.
+
+        Args:
+            sources (list, optional): Names of the sources to fetch. Defaults to all needed ones.
+        """
+        metrics = self.visible_metrics()
+        needed = sources_for(metrics)
+        sources = [name for name in (sources or needed) if name in needed]
+        if not sources:
+            return
+        if self.refresh_worker.request_refresh(self.currency, sources, self.last_results, metrics):
+            self.timer.stop()  # Rearmed once the refresh is done
+
+    def visible_metrics(self):
+        """Returns the metrics whose labels are shown."""
+        return visible_metrics(self.settings_manager.get("label_visibility", {}))
+
+    def update_enabled_sources(self):
+        """Stops polling the sources that no visible label needs."""
+        needed = sources_for(self.visible_metrics())
+        self.scheduler.set_disabled([name for name in self.scheduler.policies if name not in needed])
+
+    def poll_due_sources(self):
+        """Refreshes the sources whose interval has run out."""
+        due = self.scheduler.due_sources()
+        if due:
+            self.fetch_data(due)
+        else:
+            self.schedule_next_poll()
+
+    def schedule_next_poll(self):
+        """Arms the timer for the next source that becomes due."""
+        self.timer.start(int(self.scheduler.seconds_until_next() * 1000))
+
+    def backfill_history(self):
+        """Fetches the values missed while the widget was not running and loads them into the history."""
+        currency = self.currency
+        if self.history_store.backfill(currency, self.backfill_from):
+            self.history_store.load_into(self.history, [f"price:{currency}", "block_height"])
+
+    def on_data_ready(self, currency, results, processed_data):
+        """Updates the output with the data of a finished refresh."""
+        if results:
+            # Failed sources keep their last good value, marked as stale
+            self.last_results = merge_results(self.last_results, results)
+            self.ui_components.set_stale(False)  # Fresh data replaces the startup snapshot
+            self.alert_engine.submit(results)
+            for name, result in results.items():
+                if result.ok:
+                    self.scheduler.record_success(name, result.value)
+                else:
+                    self.scheduler.record_failure(name, retry_after=result.retry_after)  # Retried with backoff or once allowed
         else:
-            handle_error()
+            for name in self.scheduler.due_sources():
+                self.scheduler.record_failure(name)
+        self.schedule_next_poll()
+        if currency != self.currency or not processed_data:
+            # The currency was switched while fetching, render the new one from memory
+            if not self.render_from_memory():
+                self.show_data(handle_error())  # Nothing fetched so far
+        else:
+            self.show_data(processed_data)
+
+    def on_stream_state(self, connected):
+        """Stops polling the streamed sources while the WebSocket feed is connected."""
+        if self.daemon_connected:
+            return  # The daemon covers all sources
+        self.scheduler.set_paused(STREAMED_SOURCES, connected)
+        if not self.refresh_worker.running:
+            self.schedule_next_poll()
+
+    def on_stream_update(self, updates):
+        """Merges pushed values and updates the labels that show them."""
+        if not self.last_results:
+            return  # Wait for the first full refresh
+        now = time.time()
+        results = {name: SourceResult(value, now) for name, value in updates.items()}
+        self.history.record_results(results, self.currency)
+        self.alert_engine.submit(results)
+        self.last_results = merge_results(self.last_results, results)
+        metrics = self.visible_metrics()
+        data = format_data(self.last_results, self.currency, self.history, metrics)
+        if data:
+            self.show_data(process_data(data, metrics))  # Only the labels whose text changed are touched
+
+    def on_daemon_state(self, connected):
+        """Hands all fetching to the daemon while it runs and takes it back when it stops."""
+        self.daemon_connected = connected
+        self.scheduler.set_paused(self.scheduler.policies, connected)
+        if connected:
+            self.mempool_stream.stop()  # The daemon has its own feed
+        elif self.settings_manager.get("live_updates", True):
+            self.mempool_stream.start()
+        if not self.refresh_worker.running:
+            self.schedule_next_poll()
+
+    def on_daemon_update(self, results):
+        """Renders the results published by the daemon."""
+        self.history.record_results(results, self.currency)
+        self.alert_engine.submit(results)
+        self.last_results = merge_results(self.last_results, results)
+        self.ui_components.set_stale(False)
+        self.render_from_memory()
+
+    def on_alert(self, message):
+        """Shows the message of a fired alert below the rows for a while."""
+        self.ui_components.show_alert(message)
+        self.alert_timer.start(ALERT_DISPLAY_TIME)
+        self.adjustSize()
+
+    def clear_alert(self):
+        """Hides the last alert."""
+        self.ui_components.show_alert(None)
+        self.adjustSize()
+
+    def render_from_memory(self):
+        """Renders the last fetched data in the current currency without network I/O.
+
+        Returns:
+            bool: True if there was data to render.
+        """
+        metrics = self.visible_metrics()
+        with instrumentation.span("format"):
+            data = format_data(self.last_results, self.currency, self.history, metrics) if self.last_results else None
+            processed_data = process_data(data, metrics) if data else None
+        if not processed_data:
+            return False
+        self.show_data(processed_data)
+        return True
+
+    def show_data(self, processed_data):
+        """Updates the labels with processed data, resizing the window only if the widest row changed."""
+        with instrumentation.span("render"):
+            resized = self.ui_components.update_labels(processed_data)  # Touches only changed labels
+            self.update_stale_labels()
+            self.update_sparklines()
+
+            if resized:
+                self.ui_components.updateGeometry()  # Recalculate layout
+                self.adjustSize()  # Recalculate the window size
+
+    def update_sparklines(self):
+        """Draws the recorded values of the last 24 hours next to Price, Fees and Hashrate."""
+        if not self.settings_manager.get("sparklines", False):
+            return
+        metrics = {"Price": f"price:{self.currency}", "Fees": "fees", "Hashrate": "hashrate"}
+        self.ui_components.update_sparklines({
+            label: self.history.window(metric, CHANGE_WINDOW)[1] for label, metric in metrics.items()
+        })
+
+    def update_stale_labels(self):
+        """Dims the labels of sources that show their last good value after a failed fetch."""
+        stale_sources = [name for name, result in (self.last_results or {}).items() if result.stale]
+        self.ui_components.set_stale_labels([label for name in stale_sources for label in SOURCE_LABELS[name]])
 
     def save_settings(self):
         """Saves the current settings to a JSON file and updates the data."""
@@ -172,15 +425,33 @@ class RoundedWidget(QWidget):
             "transparency": self.background_color.alpha(),
             "font_size": self.ui_components.monospace_font.pointSize(),
             "currency": self.currency,
-            "label_visibility": {label_name: label.isVisible() for label_name, label in self.ui_components.output_labels.items()},
+            "label_visibility": {label_name: not label.isHidden() for label_name, label in self.ui_components.output_labels.items()},
             "position": (self.pos().x(), self.pos().y())  # Save the current widget position as a tuple
         }
-        print(f"Saving settings: {settings}")  # Debugging output
-        self.settings_manager.save_settings(settings)  # Use the SettingsManager
+        self.settings_manager.save_settings(settings)  # Written to disk only if something changed
+
+    def showEvent(self, event):
+        """Restores the regular refresh intervals when the widget is shown."""
+        self.scheduler.set_hidden(False)
+        if self.background_started and not self.refresh_worker.running:
+            self.schedule_next_poll()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        """Backs off refreshing while the widget is hidden."""
+        self.scheduler.set_hidden(True)
+        if not self.refresh_worker.running:
+            self.schedule_next_poll()
+        super().hideEvent(event)
 
     def closeEvent(self, event):
         """Event handler when closing the window."""
         self.save_settings()  # Save settings on close
+        self.settings_manager.flush()  # Write pending changes before exiting
+        self.mempool_stream.stop(wait=True)  # Close the socket cleanly before exiting
+        self.daemon_subscription.stop()
+        self.alert_engine.stop()
+        self.history_store.flush()  # Keep the values pushed since the last refresh
         event.accept()  # Close the window
 
     # Add methods to move the window
@@ -195,6 +466,7 @@ class RoundedWidget(QWidget):
             event.accept()
 
 if __name__ == "__main__":
+    init_locale()  # Before any thread formats numbers
     app = QApplication(sys.argv)
     window = RoundedWidget()
     window.show()
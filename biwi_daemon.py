@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from bitcoin_data import fetch_all, format_data, merge_results, SourceResult, CURRENCY, REFRESH_DEADLINE  # Import the fetch pipeline
+from data_processing import process_data  # Import data processing function for text output
+from settings_manager import SettingsManager, get_settings_manager  # Import the shared settings
+from metrics import visible_metrics, sources_for  # Import the registry of displayed metrics
+from scheduler import PollScheduler  # Import the per-source refresh scheduler
+from live_stream import MempoolStream, STREAMED_SOURCES  # Import the mempool.space WebSocket feed
+from resilience import backoff_delay  # Import the backoff used between reconnects
+import instrumentation  # Import the optional metrics endpoint
+from formatting import init_locale  # Import the locale setup of the number formatters
+
+SUBSCRIBE_RECONNECT_MAX_DELAY = 60  # Longest wait before a client looks for the daemon again
+CLIENT_TIMEOUT = REFRESH_DEADLINE + 5  # Seconds a client waits for an answer of the daemon
+SETTINGS_FILE = "settings.json"  # Shared with the widgets, whose label_visibility decides what is fetched
+
+
+def default_socket_path():
+    """Returns the path of the daemon's Unix socket, private to the current user."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "biwi.sock")
+    return os.path.join("/tmp", f"biwi-{os.getuid()}.sock")
+
+
+def check_socket_owner(path):
+    """Makes sure a socket path is a socket of the current user before it is trusted.
+
+    Without $XDG_RUNTIME_DIR the socket lives in /tmp under a predictable name, where
+    another user could bind it first and serve made-up data.
+
+    Args:
+        path (str): The socket path, which must exist.
+
+    Raises:
+        PermissionError: If the path is not a socket or belongs to another user.
+        OSError: If the path cannot be read.
+    """
+    status = os.lstat(path)
+    if not stat.S_ISSOCK(status.st_mode) or status.st_uid != os.getuid():
+        raise PermissionError(f"{path} is not a socket of the current user")
+
+
+def visible_sources(settings_manager=None):
+    """Returns the sources of the rows shown with the label_visibility setting.
+
+    Hidden rows are never fetched, by the daemon or by the direct fallback.
+
+    Args:
+        settings_manager (SettingsManager, optional): The settings to read. Defaults to the shared ones.
+    """
+    settings_manager = settings_manager or get_settings_manager(SETTINGS_FILE)
+    return sources_for(visible_metrics(settings_manager.get("label_visibility", {})))
+
+
+def encode_results(results):
+    """Converts SourceResult objects to a JSON serializable dictionary."""
+    return {name: result.to_dict() for name, result in results.items()}
+
+
+def decode_results(data):
+    """Converts the output of encode_results back to SourceResult objects."""
+    return {name: SourceResult.from_dict(result) for name, result in data.items()}
+
+
+class SnapshotDaemon:
+    def __init__(self, socket_path=None):
+        """Initializes the daemon that runs the fetch pipeline once for many clients.
+
+        Args:
+            socket_path (str, optional): The Unix socket to serve on. Defaults to default_socket_path().
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.scheduler = PollScheduler()
+        self.results = {}  # Latest SourceResult of each source
+        self.updated_at = None  # When the results last changed
+        self.version = 0  # Incremented on every change, clients wait for it to move
+        self.condition = threading.Condition()  # Guards the fields above and the scheduler
+        self.wake = threading.Event()  # Wakes the fetch loop before its next source is due
+        self.stopped = threading.Event()
+        self.stream = MempoolStream(self.on_stream_update, self.on_stream_state)
+        self.server = None
+        self.settings_mtime = None  # Modification time of the settings file the sources were read from
+        self.update_sources()
+
+    def snapshot(self):
+        """Returns the latest results as a JSON serializable dictionary."""
+        with self.condition:
+            return {"version": self.version, "updated_at": self.updated_at, "results": encode_results(self.results)}
+
+    def publish(self, results):
+        """Merges new results and wakes the clients waiting for a change."""
+        with self.condition:
+            self.results = merge_results(self.results, results)
+            self.updated_at = time.time()
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait_for_change(self, version, timeout):
+        """Waits until the results are newer than the given version.
+
+        Returns:
+            bool: True if the results changed, False on timeout or shutdown.
+        """
+        deadline = time.time() + timeout
+        with self.condition:
+            while self.version <= version and not self.stopped.is_set():
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(min(remaining, 1))  # Wake up regularly to notice a shutdown
+            return self.version > version
+
+    def request_refresh(self):
+        """Makes all polled sources due and wakes the fetch loop.
+
+        Returns:
+            int: The version to wait for a change from.
+        """
+        with self.condition:
+            self.scheduler.mark_due()
+            version = self.version
+        self.wake.set()
+        return version
+
+    def update_sources(self):
+        """Disables the sources of hidden rows, reading the settings again whenever a widget saved them."""
+        try:
+            mtime = os.stat(SETTINGS_FILE).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self.settings_mtime and mtime is not None:
+            return
+        self.settings_mtime = mtime
+        needed = visible_sources(SettingsManager(SETTINGS_FILE))  # A fresh manager, the shared one never rereads the file
+        with self.condition:
+            self.scheduler.set_disabled([name for name in self.scheduler.policies if name not in needed])
+
+    def run_fetch_loop(self):
+        """Fetches the due sources until the daemon stops."""
+        while not self.stopped.is_set():
+            self.update_sources()
+            with self.condition:
+                due = self.scheduler.due_sources()
+            if due:
+                results = fetch_all(due)
+                with self.condition:
+                    for name, result in results.items():
+                        if result.ok:
+                            self.scheduler.record_success(name, result.value)
+                        else:
+                            self.scheduler.record_failure(name, retry_after=result.retry_after)
+                self.publish(results)
+            with self.condition:
+                wait = self.scheduler.seconds_until_next()
+            self.wake.wait(wait)
+            self.wake.clear()
+
+    def on_stream_update(self, updates):
+        """Publishes values pushed by the WebSocket feed."""
+        now = time.time()
+        self.publish({name: SourceResult(value, now) for name, value in updates.items()})
+
+    def on_stream_state(self, connected):
+        """Stops polling the streamed sources while the WebSocket feed is connected."""
+        with self.condition:
+            self.scheduler.set_paused(STREAMED_SOURCES, connected)
+        self.wake.set()
+
+    def serve_forever(self):
+        """Starts fetching and serves the results until interrupted."""
+        if os.path.lexists(self.socket_path):
+            check_socket_owner(self.socket_path)  # Never serve next to, or remove, a socket of another user
+            if DaemonClient(self.socket_path).available():
+                raise RuntimeError(f"A daemon is already serving on {self.socket_path}")
+            os.unlink(self.socket_path)  # Left over from a daemon that crashed
+
+        threading.Thread(target=self.run_fetch_loop, name="biwi-fetch-loop", daemon=True).start()
+        self.stream.start()
+
+        old_umask = os.umask(0o077)  # The socket is only for the current user
+        try:
+            self.server = DaemonServer(self.socket_path, DaemonRequestHandler)
+        finally:
+            os.umask(old_umask)
+        self.server.snapshot_daemon = self
+        print(f"Serving Bitcoin data on {self.socket_path}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stops fetching and serving and removes the socket."""
+        self.stopped.set()
+        self.wake.set()
+        self.stream.stop(wait=True)
+        with self.condition:
+            self.condition.notify_all()
+        if self.server is not None:
+            self.server.server_close()
+            self.server = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True  # Subscribed clients must not keep the process alive
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        """Answers one request line of a client.
+
+        The request is a JSON object whose "cmd" is "snapshot" for the latest results,
+        "refresh" to fetch all sources first, or "subscribe" for the latest results now
+        and again after every change.
+        """
+        daemon = self.server.snapshot_daemon
+        try:
+            request = json.loads(self.rfile.readline() or b"{}")
+        except ValueError:
+            request = {}
+        command = request.get("cmd", "snapshot")
+
+        try:
+            if command == "subscribe":
+                version = -1
+                while not daemon.stopped.is_set():
+                    if daemon.wait_for_change(version, 60):
+                        snapshot = daemon.snapshot()
+                        version = snapshot["version"]
+                        self.send(snapshot)
+                return
+            if command == "refresh":
+                daemon.wait_for_change(daemon.request_refresh(), REFRESH_DEADLINE)
+            self.send(daemon.snapshot())
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client went away
+
+    def send(self, data):
+        """Writes one JSON line to the client."""
+        self.wfile.write(json.dumps(data).encode() + b"\n")
+        self.wfile.flush()
+
+
+class DaemonClient:
+    def __init__(self, socket_path=None):
+        """Initializes a client of the daemon.
+
+        Args:
+            socket_path (str, optional): The daemon's Unix socket. Defaults to default_socket_path().
+        """
+        self.socket_path = socket_path or default_socket_path()
+
+    def available(self):
+        """Returns whether a daemon is listening on the socket."""
+        try:
+            with self.connect(timeout=1):
+                return True
+        except OSError:
+            return False
+
+    def connect(self, timeout=CLIENT_TIMEOUT):
+        """Opens a connection to the daemon, raises OSError if none is running."""
+        check_socket_owner(self.socket_path)  # Only trust a daemon of the current user
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        try:
+            connection.connect(self.socket_path)
+        except OSError:
+            connection.close()
+            raise
+        return connection
+
+    def request(self, command="snapshot"):
+        """Sends one request and returns the results of the answer.
+
+        Args:
+            command (str): "snapshot" for the latest results or "refresh" to fetch first.
+
+        Returns:
+            dict: SourceResult objects keyed by source name.
+
+        Raises:
+            OSError: If no daemon is running or it did not answer in time.
+        """
+        with self.connect() as connection:
+            connection.sendall(json.dumps({"cmd": command}).encode() + b"\n")
+            with connection.makefile("rb") as reader:
+                line = reader.readline()
+        if not line:
+            raise ConnectionError("The daemon closed the connection")
+        return decode_results(json.loads(line)["results"])
+
+
+def fetch_via_daemon(sources=None, socket_path=None):
+    """Fetches results from a running daemon, or directly if none is running.
+
+    Args:
+        sources (list, optional): Names of the sources to fetch when no daemon is running.
+        socket_path (str, optional): The daemon's Unix socket.
+
+    Returns:
+        dict: SourceResult objects keyed by source name.
+    """
+    try:
+        return DaemonClient(socket_path).request("refresh")
+    except (OSError, ValueError, KeyError):
+        return fetch_all(sources)
+
+
+class DaemonSubscription:
+    def __init__(self, on_update, on_state, socket_path=None):
+        """Initializes the subscription of a client to the daemon's results.
+
+        The callbacks are called from the subscription thread.
+
+        Args:
+            on_update (callable): Called with the SourceResult objects of every change.
+            on_state (callable): Called with True once subscribed and with False when the daemon went away.
+            socket_path (str, optional): The daemon's Unix socket.
+        """
+        self.client = DaemonClient(socket_path)
+        self.on_update = on_update
+        self.on_state = on_state
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        """Starts looking for the daemon and following its results."""
+        if self.thread is not None:
+            return
+        self.stopped = threading.Event()  # A fresh event, so an old thread still winding down stays stopped
+        self.thread = threading.Thread(target=self.run, args=(self.stopped,), name="biwi-subscription", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Ends the subscription."""
+        self.stopped.set()
+        self.thread = None
+
+    def run(self, stopped):
+        """Follows the daemon, looking for it again with backoff whenever it is not there.
+
+        Args:
+            stopped (threading.Event): Set when this thread should end.
+        """
+        attempt = 0
+        while not stopped.is_set():
+            try:
+                with self.client.connect(timeout=None) as connection:
+                    connection.sendall(json.dumps({"cmd": "subscribe"}).encode() + b"\n")
+                    attempt = 0
+                    self.on_state(True)
+                    try:
+                        with connection.makefile("rb") as reader:
+                            for line in reader:
+                                if stopped.is_set():
+                                    break
+                                self.on_update(decode_results(json.loads(line)["results"]))
+                    finally:
+                        self.on_state(False)
+            except (OSError, ValueError, KeyError):
+                pass  # No daemon running or it went away
+            if stopped.wait(backoff_delay(attempt, 2, SUBSCRIBE_RECONNECT_MAX_DELAY)):
+                break
+            attempt += 1
+
+
+def main():
+    """Runs the daemon or prints a snapshot for scripts and status bars."""
+    parser = argparse.ArgumentParser(description="Serve Bitcoin data to BiWi widgets and scripts over a local Unix socket.")
+    parser.add_argument("--serve", action="store_true", help="run the daemon")
+    parser.add_argument("--once", action="store_true", help="print one snapshot and exit (the default)")
+    parser.add_argument("--json", action="store_true", help="print the snapshot as JSON")
+    parser.add_argument("--refresh", action="store_true", help="fetch fresh data before printing")
+    parser.add_argument("--currency", default=None, help="currency for formatted output, e.g. usd")
+    parser.add_argument("--socket", default=None, help="path of the Unix socket")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve timings and counters on this local port (/metrics, /stats.json)")
+    args = parser.parse_args()
+
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))  # settings.json lives next to the scripts
+    init_locale()  # Before the fetch threads format numbers
+
+    if args.serve:
+        if args.metrics_port is not None:
+            instrumentation.start_http_server(args.metrics_port)
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # Clean up the socket when stopped
+        try:
+            SnapshotDaemon(args.socket).serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    try:
+        results = DaemonClient(args.socket).request("refresh" if args.refresh else "snapshot")
+    except (OSError, ValueError, KeyError):
+        results = fetch_all(visible_sources())  # No daemon running, fetch directly
+
+    currency = args.currency or get_settings_manager().get("currency", CURRENCY)
+    data = format_data(results, currency)
+    if args.json:
+        print(json.dumps({"results": encode_results(results), "formatted": data}, indent=4))
+        return 0 if data else 1
+
+    processed_data = process_data(data)
+    if not processed_data:
+        print("Error retrieving Bitcoin data.", file=sys.stderr)
+        return 1
+    for line in processed_data.values():
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
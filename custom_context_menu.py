@@ -21,6 +21,7 @@ class CustomContextMenu:
         self.add_action(context_menu, "Font Color", self.main_window.change_text_color)  # Add Font Color action
         self.add_action(context_menu, "Background", self.main_window.change_background_color)  # Add Background action
         self.add_action(context_menu, "Transparency", self.main_window.change_transparency)  # Add Transparency action
+        self.add_action(context_menu, "Sparklines", self.main_window.toggle_sparklines)  # Add Sparklines toggle
         self.add_action(context_menu, "Info", lambda: show_info(self.main_window))  # Add Info action
         self.add_action(context_menu, "Close", self.main_window.close)  # Add Close action
 
@@ -0,0 +1,88 @@
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from operator import itemgetter
+
+BLOCK_VSIZE = 1_000_000  # Virtual bytes that fit into one block
+PERCENTILES = (10, 50, 90)  # Percentiles of the waiting vsize shown in the fee rows
+
+
+class FeeHistogram:
+    def __init__(self, buckets):
+        """Initializes the cumulative view of a mempool fee histogram.
+
+        The columns are split and summed up once with C-level iterators (zip,
+        itertools.accumulate), so every lookup afterwards is a binary search, also for
+        histograms with thousands of buckets.
+
+        Args:
+            buckets (list): [fee rate, vsize] pairs as in the fee_histogram of /api/mempool.
+        """
+        pairs = sorted(buckets, key=itemgetter(0))  # Lowest rate first, a single pass if already sorted
+        self.rates, vsizes = zip(*pairs) if pairs else ((), ())  # Split into columns without a Python loop
+        self.cumulative = list(accumulate(vsizes))  # vsize paying at most each rate
+        self.total = self.cumulative[-1] if self.cumulative else 0.0
+
+    def vsize_above(self, rate):
+        """Returns the vsize in vbytes paying more than the given fee rate."""
+        index = bisect_right(self.rates, rate)
+        return self.total - self.cumulative[index - 1] if index else self.total
+
+    def rate_at_depth(self, vsize):
+        """Returns the fee rate paid at the given vsize from the top of the mempool."""
+        return self.percentile((self.total - vsize) / self.total * 100) if self.total else 0.0
+
+    def percentile(self, percent):
+        """Returns the fee rate that the given percent of the waiting vsize pays at most."""
+        if not self.cumulative:
+            return 0.0
+        index = min(bisect_left(self.cumulative, self.total * percent / 100), len(self.cumulative) - 1)
+        return self.rates[index]
+
+    def blocks_to_confirm(self, rate):
+        """Returns the estimated number of blocks until a transaction with the fee rate confirms."""
+        return int(self.vsize_above(rate) // BLOCK_VSIZE) + 1
+
+
+def blocks_to_confirm(rate, projected_blocks, histogram):
+    """Returns the blocks until a transaction with the fee rate confirms.
+
+    Uses the projected blocks while the fee rate falls into one of them, and the
+    histogram beyond the last one, which collects the rest of the mempool.
+
+    Args:
+        rate (float): The fee rate in sat/vB.
+        projected_blocks (list): The blocks of /v1/fees/mempool-blocks, next block first.
+        histogram (FeeHistogram): The fee histogram of the mempool.
+
+    Returns:
+        int: The number of blocks, 1 for the next block.
+    """
+    for index, block in enumerate(projected_blocks[:-1]):
+        if block['feeRange'] and rate >= block['feeRange'][0]:
+            return index + 1
+    return max(len(projected_blocks), histogram.blocks_to_confirm(rate))
+
+
+def summarize(histogram, projected_blocks):
+    """Returns the fee distribution shown in the fee rows.
+
+    Args:
+        histogram (FeeHistogram): The fee histogram of the mempool.
+        projected_blocks (list): The blocks of /v1/fees/mempool-blocks, next block first.
+
+    Returns:
+        dict: The fee rates at PERCENTILES in 'rates', the vsize paying more than each
+        of them in 'vsize_above', their blocks to confirm in 'blocks' and the median fee
+        rate of the next block in 'next_block_median'.
+    """
+    rates = [histogram.percentile(percent) for percent in PERCENTILES]
+    if projected_blocks:
+        next_block_median = projected_blocks[0]['medianFee']
+    else:
+        next_block_median = histogram.rate_at_depth(BLOCK_VSIZE / 2)
+    return {
+        'rates': rates,
+        'vsize_above': [histogram.vsize_above(rate) for rate in rates],
+        'blocks': [blocks_to_confirm(rate, projected_blocks, histogram) for rate in rates],
+        'next_block_median': next_block_median,
+    }
@@ -0,0 +1,115 @@
+import locale
+import threading
+from currencies import currencies, currency_symbols  # Import currency data
+
+DEFAULT_SEPARATORS = (".", ",")  # Thousands separator and decimal mark when the locale defines no grouping
+
+
+class NumberFormatter:
+    def __init__(self, thousands_sep, decimal_point):
+        """Initializes a formatter for one set of separators.
+
+        Numbers are formatted with Python's own grouping and then translated to the
+        separators of the locale in a single pass, which is much cheaper than
+        locale.format_string and handles both marks at once.
+
+        Args:
+            thousands_sep (str): The thousands separator.
+            decimal_point (str): The decimal mark.
+        """
+        self.thousands_sep = thousands_sep
+        self.decimal_point = decimal_point
+        self.table = str.maketrans({",": thousands_sep, ".": decimal_point})
+
+    def integer(self, value):
+        """Formats a number rounded to an integer with thousands separators."""
+        return f"{value:,.0f}".translate(self.table)
+
+    def decimal(self, value, places):
+        """Formats a number with a fixed number of decimal places."""
+        return f"{value:,.{places}f}".translate(self.table)
+
+
+class SnapshotFormatter:
+    def __init__(self, numbers, currency):
+        """Initializes the formatter of all display fields in one currency.
+
+        Args:
+            numbers (NumberFormatter): The number formatter of the current locale.
+            currency (str): The currency of the market data.
+        """
+        self.numbers = numbers
+        self.currency_symbol = currency_symbols[currency]
+        self.currency_code = currencies[currency]
+
+    def format_fees(self, fees):
+        """Formats the recommended fees as 'hour·half hour·fastest'."""
+        integer = self.numbers.integer
+        return f"{integer(fees['hourFee'])}·{integer(fees['halfHourFee'])}·{integer(fees['fastestFee'])}"
+
+    def format_series(self, values, places=0):
+        """Formats several numbers of one row as 'a·b·c'."""
+        if places:
+            return "·".join(self.numbers.decimal(value, places) for value in values)
+        return "·".join(self.numbers.integer(value) for value in values)
+
+    def format_change(self, change):
+        """Formats a percent change like the 24h change of the market data."""
+        return self.numbers.decimal(change, 3)
+
+
+_number_formatters = {}  # NumberFormatter of each locale
+_snapshot_formatters = {}  # SnapshotFormatter keyed by locale and currency
+_formatters_lock = threading.Lock()
+_locale_initialized = False  # Whether init_locale ran
+
+
+def init_locale():
+    """Switches number formatting to the user's locale, once.
+
+    The entry points call this at startup, before any thread runs; otherwise it happens
+    on first use of the formatters instead of at import time.
+    """
+    global _locale_initialized
+    with _formatters_lock:
+        if not _locale_initialized:
+            try:
+                locale.setlocale(locale.LC_ALL, '')
+            except locale.Error as e:
+                print(f"Error setting the locale: {e}")
+            _locale_initialized = True
+
+
+def get_number_formatter():
+    """Returns the number formatter of the current numeric locale, built once per locale."""
+    if not _locale_initialized:
+        init_locale()
+    locale_name = locale.setlocale(locale.LC_NUMERIC)  # Queries the locale without changing it
+    formatter = _number_formatters.get(locale_name)
+    if formatter is None:
+        conventions = locale.localeconv()
+        if conventions['thousands_sep'] and conventions['grouping']:
+            separators = (conventions['thousands_sep'], conventions['decimal_point'])
+        else:
+            separators = DEFAULT_SEPARATORS  # The C locale groups nothing, keep the widget readable
+        with _formatters_lock:
+            formatter = _number_formatters.setdefault(locale_name, NumberFormatter(*separators))
+    return formatter
+
+
+def get_snapshot_formatter(currency):
+    """Returns the cached formatter of the display fields in a currency.
+
+    Args:
+        currency (str): The currency of the market data.
+
+    Returns:
+        SnapshotFormatter: The formatter for the current locale and the currency.
+    """
+    numbers = get_number_formatter()
+    key = (numbers.thousands_sep, numbers.decimal_point, currency)
+    formatter = _snapshot_formatters.get(key)
+    if formatter is None:
+        with _formatters_lock:
+            formatter = _snapshot_formatters.setdefault(key, SnapshotFormatter(numbers, currency))
+    return formatter
@@ -0,0 +1,181 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+
+def parse_retry_after(value, default):
+    """Returns the seconds to wait given by a Retry-After header.
+
+    Args:
+        value (str): The header value, either seconds or an HTTP date. May be None.
+        default (float): The seconds to wait if the header is missing or cannot be read.
+
+    Returns:
+        float: Seconds to wait, never negative.
+    """
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return default
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        """Initializes the request budget of a single host.
+
+        Args:
+            rate (float): Requests per second the host accepts in the long run, None to only
+                honor the deferrals asked for by the host.
+            burst (int): Requests that may be sent at once after a quiet period.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst or 0)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # Monotonic time before which the host asked not to be contacted
+
+    def _refill(self, now):
+        if self.rate is None:
+            return
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, max_wait):
+        """Reserves a token, waiting in line behind earlier reservations.
+
+        Tokens may go negative, each reservation then waits until its token has been
+        refilled, so concurrent callers are served in order instead of racing.
+
+        Args:
+            max_wait (float): The longest acceptable wait in seconds.
+
+        Returns:
+            float: Seconds to wait before sending. If it is larger than max_wait, no
+            token was taken and the request should be deferred by that long instead.
+        """
+        now = time.monotonic()
+        self._refill(now)
+        wait = max((1 - self.tokens) / self.rate if self.rate and self.tokens < 1 else 0.0, self.blocked_until - now)
+        if wait <= max_wait and self.rate:
+            self.tokens -= 1
+        return wait
+
+    def block(self, seconds):
+        """Stops handing out tokens for a while, for example after a 429 response."""
+        now = time.monotonic()
+        self.blocked_until = max(self.blocked_until, now + seconds)
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)  # The budget was used up, whatever the bucket thought
+
+
+class _Call:
+    def __init__(self):
+        """Initializes a request in flight that identical requests wait for."""
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestGovernor:
+    def __init__(self, host_limits=None, default_limit=None):
+        """Initializes the governor that paces and deduplicates requests to upstream hosts.
+
+        Args:
+            host_limits (dict, optional): (rate, burst) tuples keyed by scheme and host, like
+                "https://api.coingecko.com". Rate is in requests per second.
+            default_limit (tuple, optional): (rate, burst) of hosts that are not listed.
+                Hosts without a limit are not paced, but their deferrals are still honored.
+        """
+        self.host_limits = dict(host_limits or {})
+        self.default_limit = default_limit
+        self.buckets = {}  # TokenBucket instances keyed by scheme and host
+        self.in_flight = {}  # _Call instances keyed by URL
+        self.coalesced = 0  # Requests that shared the response of an identical one
+        self.lock = threading.Lock()
+
+    def _bucket(self, url):
+        """Returns the token bucket of the host of a URL."""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        bucket = self.buckets.get(host)
+        if bucket is None:
+            bucket = self.buckets[host] = TokenBucket(*(self.host_limits.get(host) or self.default_limit or (None, None)))
+        return bucket
+
+    def acquire(self, url, max_wait):
+        """Waits until a request to the host of a URL fits into its budget.
+
+        Args:
+            url (str): The URL about to be requested.
+            max_wait (float): The longest wait in seconds this call may block.
+
+        Returns:
+            float: 0 once the request may be sent, or the seconds until the host accepts
+            requests again if that is longer than max_wait. Nothing is sent in that case.
+        """
+        with self.lock:
+            wait = self._bucket(url).reserve(max_wait)
+        if wait > max_wait:
+            return wait
+        if wait > 0:
+            time.sleep(wait)  # Only blocks this source's pool thread
+        return 0.0
+
+    def defer(self, url, seconds):
+        """Blocks the host of a URL for the given seconds, as asked by a Retry-After header."""
+        with self.lock:
+            self._bucket(url).block(seconds)
+
+    def coalesce(self, url, request):
+        """Runs a request unless an identical one is in flight, then shares its outcome.
+
+        Args:
+            url (str): The URL, identical URLs share one request.
+            request (callable): Sends the request and returns the response.
+
+        Returns:
+            The return value of request, from this call or the one in flight.
+
+        Raises:
+            Exception: Whatever the request raised, in every caller that shared it.
+        """
+        with self.lock:
+            call = self.in_flight.get(url)
+            leader = call is None
+            if leader:
+                call = self.in_flight[url] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = request()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self.lock:
+                    del self.in_flight[url]
+                call.done.set()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def reset(self, host_limits=None):
+        """Refills all budgets and lifts all deferrals, for example between benchmark runs.
+
+        Args:
+            host_limits (dict, optional): New limits keyed by scheme and host, replacing the current ones.
+        """
+        with self.lock:
+            if host_limits is not None:
+                self.host_limits = dict(host_limits)
+            self.buckets.clear()
+            self.coalesced = 0
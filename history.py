@@ -0,0 +1,244 @@
+import threading
+import time
+from array import array
+
+HISTORY_CAPACITY = 10080  # Points kept per metric, one week at one point per minute
+MIN_INTERVAL = 60  # Seconds per point, later values of the same minute replace the earlier one
+COVERAGE_TOLERANCE = 0.05  # Share of a window that may be missing at its start for a query to count
+METRICS = ('fees', 'hashrate', 'unconfirmed_tx', 'block_height')  # Recorded metrics besides the price of each currency
+
+
+class RingBuffer:
+    def __init__(self, capacity=HISTORY_CAPACITY):
+        """Initializes a fixed-size buffer of timestamped values.
+
+        Timestamps and values live in two preallocated arrays of doubles, so memory stays
+        constant no matter how long the widget runs. The oldest point is overwritten once
+        the buffer is full.
+
+        Args:
+            capacity (int): The number of points kept.
+        """
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('d', bytes(8 * capacity))
+        self.start = 0  # Physical index of the oldest point
+        self.count = 0  # Number of points stored
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, value):
+        """Adds a point in O(1), overwriting the oldest one if the buffer is full.
+
+        Points must be appended in time order.
+        """
+        end = (self.start + self.count) % self.capacity
+        self.times[end] = timestamp
+        self.values[end] = value
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def replace_last(self, timestamp, value):
+        """Overwrites the newest point, which must exist, in O(1)."""
+        end = (self.start + self.count - 1) % self.capacity
+        self.times[end] = timestamp
+        self.values[end] = value
+
+    def last(self):
+        """Returns the newest point as (timestamp, value), or None if the buffer is empty."""
+        if not self.count:
+            return None
+        end = (self.start + self.count - 1) % self.capacity
+        return self.times[end], self.values[end]
+
+    def first(self):
+        """Returns the oldest point as (timestamp, value), or None if the buffer is empty."""
+        if not self.count:
+            return None
+        return self.times[self.start], self.values[self.start]
+
+    def _time_at(self, index):
+        """Returns the timestamp of the point at a logical index, 0 being the oldest."""
+        return self.times[(self.start + index) % self.capacity]
+
+    def _index_since(self, since):
+        """Returns the logical index of the first point at or after a time, by binary search."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._time_at(middle) < since:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def window(self, since):
+        """Returns the points at or after a time as two arrays in time order.
+
+        Args:
+            since (float): The start of the window.
+
+        Returns:
+            tuple: Arrays of timestamps and values.
+        """
+        index = self._index_since(since)
+        if index == self.count:
+            return array('d'), array('d')
+        first = (self.start + index) % self.capacity
+        end = (self.start + self.count) % self.capacity
+        if first < end:
+            return self.times[first:end], self.values[first:end]
+        # The window wraps around the end of the arrays
+        return self.times[first:] + self.times[:end], self.values[first:] + self.values[:end]
+
+
+class MetricHistory:
+    def __init__(self, capacity=HISTORY_CAPACITY, store=None):
+        """Initializes the rolling in-memory history of all metrics.
+
+        Args:
+            capacity (int): The number of points kept per metric.
+            store (HistoryStore, optional): Where recorded results are also saved across restarts.
+        """
+        self.capacity = capacity
+        self.store = store
+        self.buffers = {}  # RingBuffer of each metric, created on first use
+        self.lock = threading.Lock()  # Recorded in the GUI thread, queried from refresh threads
+
+    def record(self, metric, timestamp, value):
+        """Appends a point to a metric, ignoring points that are not newer than the last one.
+
+        Streamed metrics are pushed every few seconds, so a point of the same minute as
+        the last one replaces it instead. The buffer then spans its capacity in minutes
+        whatever the update rate.
+
+        Args:
+            metric (str): The metric name, like 'price:eur' or 'hashrate'.
+            timestamp (float): When the value was fetched.
+            value (float): The value.
+        """
+        with self.lock:
+            buffer = self.buffers.get(metric)
+            if buffer is None:
+                buffer = self.buffers[metric] = RingBuffer(self.capacity)
+            last = buffer.last()
+            if last is None or timestamp > last[0]:
+                if last is not None and timestamp // MIN_INTERVAL == last[0] // MIN_INTERVAL:
+                    buffer.replace_last(timestamp, float(value))
+                else:
+                    buffer.append(timestamp, float(value))
+
+    def load(self, metric, points):
+        """Merges older points, like those of the historical store, into a metric.
+
+        Args:
+            metric (str): The metric name.
+            points (iterable): (timestamp, value) tuples in time order.
+        """
+        with self.lock:
+            buffer = self.buffers.get(metric)
+            merged = dict(points)
+            if buffer is not None:
+                times, values = buffer.window(float('-inf'))
+                merged.update(zip(times, values))  # Recorded values win over loaded ones
+            self.buffers[metric] = buffer = RingBuffer(self.capacity)
+            for timestamp in sorted(merged):
+                buffer.append(timestamp, float(merged[timestamp]))
+
+    def record_results(self, results, currency):
+        """Records the fresh values of fetch results.
+
+        Args:
+            results (dict): SourceResult objects keyed by source name.
+            currency (str): The currency whose price is recorded.
+        """
+        for name, result in results.items():
+            if not result.ok or result.value is None or result.fetched_at is None:
+                continue
+            for metric, value in metric_values(name, result.value, currency):
+                self.record(metric, result.fetched_at, value)
+        if self.store is not None:
+            self.store.record_results(results, currency)
+
+    def flush(self):
+        """Writes the points pending in the store, if there is one."""
+        if self.store is not None:
+            self.store.flush()
+
+    def window(self, metric, seconds, now=None):
+        """Returns the timestamps and values of a metric over the last seconds."""
+        now = time.time() if now is None else now
+        with self.lock:
+            buffer = self.buffers.get(metric)
+            if buffer is None:
+                return array('d'), array('d')
+            return buffer.window(now - seconds)
+
+    def stats(self, metric, seconds, now=None):
+        """Returns summary statistics of a metric over the last seconds.
+
+        Args:
+            metric (str): The metric name.
+            seconds (float): The length of the window.
+            now (float, optional): The end of the window.
+
+        Returns:
+            dict: The 'min', 'max', 'mean', 'first', 'last' and 'change_pct' of the window
+            and whether the history 'covers' all of it, or None if the window is empty.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            buffer = self.buffers.get(metric)
+            if buffer is None or not len(buffer):
+                return None
+            times, values = buffer.window(now - seconds)
+            oldest = buffer.first()[0]
+        if not values:
+            return None
+        first, last = values[0], values[-1]
+        return {
+            'min': min(values),
+            'max': max(values),
+            'mean': sum(values) / len(values),
+            'first': first,
+            'last': last,
+            'change_pct': (last - first) / first * 100 if first else None,
+            'covers': oldest <= now - seconds * (1 - COVERAGE_TOLERANCE),
+        }
+
+    def change_pct(self, metric, seconds, now=None):
+        """Returns the percent change of a metric over the last seconds.
+
+        Returns:
+            float: The change, or None if the history does not reach back far enough.
+        """
+        stats = self.stats(metric, seconds, now)
+        if stats is None or not stats['covers']:
+            return None
+        return stats['change_pct']
+
+
+def metric_values(name, value, currency):
+    """Returns the (metric, number) pairs worth keeping from the value of a source.
+
+    Args:
+        name (str): The source name in bitcoin_data.SOURCES.
+        value: The fetched value of the source.
+        currency (str): The currency whose price is kept.
+
+    Returns:
+        list: (metric name, number) tuples.
+    """
+    try:
+        if name == 'market':
+            return [(f'price:{currency}', value[currency]['current_price'])] if currency in value else []
+        if name == 'fees':
+            return [('fees', value['fastestFee'])]
+        if name in ('hashrate', 'unconfirmed_tx', 'block_height'):
+            return [(name, value)]
+    except (KeyError, TypeError):
+        pass
+    return []
@@ -0,0 +1,250 @@
+import sqlite3
+import threading
+import time
+from bitcoin_data import get_with_retries, get_block_height, FetchError, BITCOIN_ID, CHANGE_WINDOW  # Import the shared fetch helpers
+from history import metric_values, MIN_INTERVAL  # Import the metric names and point spacing shared with the in-memory history
+
+MARKET_CHART_URL = f"https://api.coingecko.com/api/v3/coins/{BITCOIN_ID}/market_chart/range?vs_currency={{currency}}&from={{start}}&to={{end}}"
+BLOCKS_URL = "https://mempool.space/api/v1/blocks/{height}"  # The 15 blocks up to a height, newest first
+BATCH_SIZE = 50  # Pending points that trigger a write
+BACKFILL_MIN_GAP = 15 * 60  # Gaps shorter than this are not worth a backfill request
+BACKFILL_MAX_AGE = 30 * 24 * 60 * 60  # Oldest point a backfill reaches back to
+BACKFILL_MAX_PAGES = 20  # Block pages fetched per backfill, 300 blocks or about two days
+RETENTION = BACKFILL_MAX_AGE  # Points older than this are deleted
+PRUNE_INTERVAL = 60 * 60  # Seconds between deletions of expired points while running
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS points (
+    metric TEXT NOT NULL,
+    ts REAL NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (metric, ts)
+) WITHOUT ROWID
+"""
+
+
+class HistoryStore:
+    def __init__(self, path="history.db"):
+        """Initializes the SQLite store that keeps the history across restarts.
+
+        Points are keyed by metric and timestamp, the same names as in history.MetricHistory,
+        so range queries are a single index scan. Points are buffered and written in batches,
+        at most one per minute and metric, and points older than RETENTION are deleted.
+
+        Args:
+            path (str): The database file.
+        """
+        self.path = path
+        self.pending = []  # (metric, ts, value) rows not written yet
+        self.lock = threading.Lock()  # Used from the GUI thread and from refresh threads
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")  # Readers do not block the writer
+        self.connection.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, without an fsync per commit
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+        self.pruned_at = 0.0  # When expired points were last deleted
+        self._prune()
+
+    def add(self, metric, timestamp, value):
+        """Buffers a point, writing the batch once it is full."""
+        with self.lock:
+            self.pending.append((metric, timestamp, float(value)))
+            if len(self.pending) >= BATCH_SIZE:
+                self._write_pending()
+
+    def record_results(self, results, currency):
+        """Buffers the fresh values of fetch results.
+
+        Args:
+            results (dict): SourceResult objects keyed by source name.
+            currency (str): The currency whose price is recorded.
+        """
+        for name, result in results.items():
+            if not result.ok or result.value is None or result.fetched_at is None:
+                continue
+            for metric, value in metric_values(name, result.value, currency):
+                self.add(metric, result.fetched_at, value)
+
+    def flush(self):
+        """Writes all pending points in one transaction."""
+        with self.lock:
+            self._write_pending()
+
+    def _write_pending(self):
+        """Writes the pending points, the lock must be held.
+
+        Only the newest point of each minute is kept, replacing a stored one of the same minute.
+        """
+        if not self.pending:
+            return
+        rows = {}  # Newest pending row of each metric and minute
+        for row in self.pending:
+            key = (row[0], row[1] // MIN_INTERVAL)
+            if key not in rows or row[1] >= rows[key][1]:
+                rows[key] = row
+        try:
+            with self.connection:
+                self.connection.executemany(
+                    "DELETE FROM points WHERE metric = ? AND ts >= ? AND ts < ?",
+                    [(metric, minute * MIN_INTERVAL, (minute + 1) * MIN_INTERVAL) for metric, minute in rows],
+                )
+                self.connection.executemany("INSERT INTO points VALUES (?, ?, ?)", rows.values())
+            self.pending = []
+        except sqlite3.Error as e:
+            print(f"Error writing history: {e}")
+        if time.time() - self.pruned_at >= PRUNE_INTERVAL:
+            self._prune()
+
+    def _prune(self):
+        """Deletes the expired points, the lock must be held."""
+        self.pruned_at = time.time()
+        try:
+            with self.connection:
+                self.connection.execute("DELETE FROM points WHERE ts < ?", (self.pruned_at - RETENTION,))
+        except sqlite3.Error as e:
+            print(f"Error pruning history: {e}")
+
+    def last_point(self, metric):
+        """Returns the newest stored point of a metric as (timestamp, value), or None."""
+        self.flush()
+        with self.lock:
+            return self.connection.execute(
+                "SELECT ts, value FROM points WHERE metric = ? ORDER BY ts DESC LIMIT 1", (metric,)
+            ).fetchone()
+
+    def last_points(self, metrics):
+        """Returns the newest stored point of each metric, keyed by metric name.
+
+        Read at startup, before any refresh or stream records, this is where the
+        backfill has to start from.
+        """
+        return {metric: self.last_point(metric) for metric in metrics}
+
+    def range(self, metric, start, end=None):
+        """Returns the stored points of a metric in a time range.
+
+        Args:
+            metric (str): The metric name.
+            start (float): The start of the range.
+            end (float, optional): The end of the range. Defaults to now.
+
+        Returns:
+            list: (timestamp, value) tuples in time order.
+        """
+        end = time.time() if end is None else end
+        self.flush()
+        with self.lock:
+            return self.connection.execute(
+                "SELECT ts, value FROM points WHERE metric = ? AND ts >= ? AND ts <= ? ORDER BY ts", (metric, start, end)
+            ).fetchall()
+
+    def ohlc(self, metric, start, end=None, bucket=3600):
+        """Downsamples the points of a metric to open/high/low/close buckets.
+
+        Args:
+            metric (str): The metric name.
+            start (float): The start of the range.
+            end (float, optional): The end of the range. Defaults to now.
+            bucket (float): The length of a bucket in seconds.
+
+        Returns:
+            list: (bucket start, open, high, low, close) tuples in time order, only for
+            buckets that hold points.
+        """
+        candles = []
+        for timestamp, value in self.range(metric, start, end):
+            bucket_start = timestamp - timestamp % bucket
+            if candles and candles[-1][0] == bucket_start:
+                _, open_, high, low, _ = candles[-1]
+                candles[-1] = (bucket_start, open_, max(high, value), min(low, value), value)
+            else:
+                candles.append((bucket_start, value, value, value, value))
+        return candles
+
+    def load_into(self, history, metrics, seconds=CHANGE_WINDOW, now=None):
+        """Loads the recent stored points into the in-memory history.
+
+        Args:
+            history (MetricHistory): The in-memory history.
+            metrics (iterable): The metric names to load.
+            seconds (float): How far back to load.
+            now (float, optional): The end of the range.
+        """
+        now = time.time() if now is None else now
+        for metric in metrics:
+            points = self.range(metric, now - seconds, now)
+            if points:
+                history.load(metric, points)
+
+    def backfill(self, currency, last_points, now=None):
+        """Fills the gap since the last stored points from the APIs, fetching only what is missing.
+
+        Prices come from CoinGecko's market_chart, block heights from mempool.space block
+        pages. Without stored prices the last 24 hours are fetched, so the locally
+        computed change is available right away.
+
+        Args:
+            currency (str): The currency whose price is backfilled.
+            last_points (dict): The newest points stored before this run, as returned by
+                last_points. Points recorded since then must not shrink the gap.
+            now (float, optional): The end of the gap.
+
+        Returns:
+            int: The number of points added.
+        """
+        now = time.time() if now is None else now
+        metric = f'price:{currency}'
+        rows = self._backfill_prices(metric, last_points.get(metric), now) + self._backfill_blocks(last_points.get('block_height'))
+        with self.lock:
+            self.pending.extend(rows)
+            self._write_pending()
+        return len(rows)
+
+    def _backfill_prices(self, metric, last, now):
+        """Returns the missing price points since the last stored one."""
+        currency = metric.split(':')[1]
+        start = max(last[0] if last else now - CHANGE_WINDOW, now - BACKFILL_MAX_AGE)
+        if now - start < BACKFILL_MIN_GAP:
+            return []
+        try:
+            response = get_with_retries(MARKET_CHART_URL.format(currency=currency, start=int(start), end=int(now)))
+        except FetchError:
+            return []  # Rate limited, the gap is filled on the next start
+        if not response:
+            return []
+        try:
+            prices = response.json()['prices']
+        except (ValueError, KeyError):
+            return []
+        return [(metric, ms / 1000, price) for ms, price in prices if ms / 1000 > start]
+
+    def _backfill_blocks(self, last):
+        """Returns the blocks mined since the last stored block height."""
+        if not last:
+            return []  # Heights are recorded from the first refresh on
+        last_height = int(last[1])
+        try:
+            height = get_block_height()
+        except FetchError:
+            return []
+
+        rows = []
+        for _ in range(BACKFILL_MAX_PAGES):
+            if height <= last_height:
+                break
+            try:
+                response = get_with_retries(BLOCKS_URL.format(height=height))
+                blocks = response.json() if response else []
+            except (FetchError, ValueError):
+                blocks = []
+            if not blocks:
+                break
+            rows.extend(('block_height', block['timestamp'], block['height']) for block in blocks if block['height'] > last_height)
+            height = min(block['height'] for block in blocks) - 1
+        return rows
+
+    def close(self):
+        """Writes the pending points and closes the database."""
+        self.flush()
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,212 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds of the duration histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRIC_PREFIX = "biwi_"
+
+_enabled = False  # Checked first by every hook, so instrumentation costs next to nothing while off
+_lock = threading.Lock()
+_counters = {}  # Counter values keyed by (name, labels)
+_timings = {}  # [count, sum, max, bucket counts] keyed by (name, labels)
+_reports = {}  # Functions returning extra sections of stats(), keyed by section name
+
+
+class _Span:
+    def __init__(self, name, labels):
+        """Initializes the timing of one operation, recorded when the block is left."""
+        self.name = name
+        self.labels = labels
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        observe(self.name, time.perf_counter() - self.started, **dict(self.labels))
+        return False
+
+
+class _NoSpan:
+    """Stand-in returned by span while instrumentation is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def enable(enabled=True):
+    """Turns recording on or off. Recorded values are kept when it is turned off."""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    """Returns whether values are recorded."""
+    return _enabled
+
+
+def reset():
+    """Drops all recorded values."""
+    with _lock:
+        _counters.clear()
+        _timings.clear()
+
+
+def add_report(name, report):
+    """Adds a section to stats(), like the hit and miss counts of the response cache.
+
+    Args:
+        name (str): The key of the section.
+        report (callable): Returns the JSON serializable section when stats() is called.
+    """
+    _reports[name] = report
+
+
+def span(name, **labels):
+    """Returns a context manager that records the duration of its block.
+
+    Args:
+        name (str): The name of the timing, like "source_fetch".
+        **labels: Labels that tell the timings apart, like source="fees".
+
+    Returns:
+        A context manager, a shared no-op one while instrumentation is off.
+    """
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, tuple(sorted(labels.items())))
+
+
+def observe(name, seconds, **labels):
+    """Records one duration of a timing."""
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        timing = _timings.get(key)
+        if timing is None:
+            timing = _timings[key] = [0, 0.0, 0.0, [0] * len(BUCKETS)]
+        timing[0] += 1
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds)
+        buckets = timing[3]
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                buckets[index] += 1
+                break
+
+
+def increment(name, amount=1, **labels):
+    """Adds to a counter, like the number of retries or bytes received."""
+    if not _enabled:
+        return
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def stats():
+    """Returns all recorded values as a JSON serializable dictionary.
+
+    Returns:
+        dict: 'counters' and 'timings', each a list of entries with the name, the labels
+        and the values. Timings hold the count, the total, mean and max seconds. The
+        sections added with add_report follow under their names.
+    """
+    with _lock:
+        counters = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in _counters.items()]
+        timings = [
+            {"name": name, "labels": dict(labels), "count": count, "sum": total, "mean": total / count if count else 0.0, "max": longest}
+            for (name, labels), (count, total, longest, _) in _timings.items()
+        ]
+    reports = {name: report() for name, report in list(_reports.items())}  # Outside the lock, reports take their own
+    return {"enabled": _enabled, "counters": counters, "timings": timings, **reports}
+
+
+def _format_labels(labels, extra=()):
+    """Returns the label set of a Prometheus sample, like {source="fees"}."""
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _escape(value):
+    """Escapes a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus_text():
+    """Returns all recorded values in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        counters = sorted(_counters.items())
+        timings = sorted((key, (count, total, list(buckets))) for key, (count, total, _, buckets) in _timings.items())
+
+    declared = set()
+    for (name, labels), value in counters:
+        metric = f"{METRIC_PREFIX}{name}_total"
+        if metric not in declared:
+            lines.append(f"# TYPE {metric} counter")
+            declared.add(metric)
+        lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+    for (name, labels), (count, total, buckets) in timings:
+        metric = f"{METRIC_PREFIX}{name}_seconds"
+        if metric not in declared:
+            lines.append(f"# TYPE {metric} histogram")
+            declared.add(metric)
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS, buckets):
+            cumulative += bucket_count
+            lines.append(f"{metric}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{metric}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+        lines.append(f"{metric}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        """Serves /metrics in the Prometheus text format and /stats.json as JSON."""
+        if self.path == "/metrics":
+            body, content_type = prometheus_text().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/stats.json":
+            body, content_type = json.dumps(stats(), indent=4).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes are not worth a line of output each
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """Enables recording and serves the values on a local port in a background thread.
+
+    Args:
+        port (int): The TCP port, 0 picks a free one.
+        host (str): The address to listen on, only the local machine by default.
+
+    Returns:
+        ThreadingHTTPServer: The server, call shutdown() to stop it.
+    """
+    enable()
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="biwi-metrics", daemon=True).start()
+    return server
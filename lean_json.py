@@ -0,0 +1,46 @@
+import json
+import re
+
+_patterns = {}  # Compiled patterns keyed by field name
+
+
+def _pattern(name):
+    pattern = _patterns.get(name)
+    if pattern is None:
+        # The key, the colon and a JSON number, captured without its surroundings
+        pattern = _patterns[name] = re.compile(rb'"' + re.escape(name.encode()) + rb'"\s*:\s*(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)')
+    return pattern
+
+
+def number_fields(content, names):
+    """Reads numeric fields of a JSON object without parsing the rest of the payload.
+
+    Only suited to fields whose name occurs nowhere else in the payload, like the
+    top-level totals next to large arrays of samples. Falls back to parsing the whole
+    payload if a field is missing or not a plain number.
+
+    Args:
+        content (bytes): The raw JSON payload.
+        names (iterable): The field names.
+
+    Returns:
+        dict: The number of each field keyed by its name, int or float as in the payload.
+
+    Raises:
+        ValueError: If the payload is not valid JSON.
+        KeyError: If a field is missing from the payload.
+    """
+    values = {}
+    for name in names:
+        match = _pattern(name).search(content)
+        if match is None:
+            return _parse_fields(content, names)
+        number = match.group(1)
+        values[name] = float(number) if b'.' in number or b'e' in number or b'E' in number else int(number)
+    return values
+
+
+def _parse_fields(content, names):
+    """Reads the fields from the fully parsed payload, the slow path of number_fields."""
+    data = json.loads(content)
+    return {name: data[name] for name in names}
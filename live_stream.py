@@ -0,0 +1,144 @@
+import importlib.util
+import json
+import threading
+from resilience import backoff_delay  # Import the backoff used between reconnects
+
+MEMPOOL_WS_URL = "wss://mempool.space/api/v1/ws"  # mempool.space WebSocket feed
+STREAMED_SOURCES = ('fees', 'block_height', 'unconfirmed_tx')  # Sources of bitcoin_data.SOURCES the feed replaces
+RECONNECT_BASE_DELAY = 2  # Seconds before the first reconnect after the socket dropped
+RECONNECT_MAX_DELAY = 300  # Longest wait between reconnects
+STOP_TIMEOUT = 2  # Seconds stop(wait=True) waits for the stream thread to end
+
+
+def parse_message(message):
+    """Extracts source updates from a mempool.space WebSocket message.
+
+    Args:
+        message (str): The raw JSON message.
+
+    Returns:
+        dict: New values keyed by the source names of bitcoin_data.SOURCES, only for
+        the sources the message carries.
+    """
+    try:
+        data = json.loads(message)
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    updates = {}
+    if isinstance(data.get('fees'), dict):
+        updates['fees'] = data['fees']  # Same shape as /v1/fees/recommended
+    if isinstance(data.get('mempoolInfo'), dict) and 'size' in data['mempoolInfo']:
+        updates['unconfirmed_tx'] = data['mempoolInfo']['size']  # Transactions in the mempool
+    if isinstance(data.get('block'), dict) and 'height' in data['block']:
+        updates['block_height'] = data['block']['height']  # A new block was mined
+    elif isinstance(data.get('blocks'), list) and data['blocks']:
+        updates['block_height'] = max(block.get('height', 0) for block in data['blocks'])  # Initial list of recent blocks
+    return updates
+
+
+class MempoolStream:
+    def __init__(self, on_update, on_state, url=MEMPOOL_WS_URL):
+        """Initializes the mempool.space WebSocket subscription.
+
+        The callbacks are called from the stream thread.
+
+        Args:
+            on_update (callable): Called with a dict of source updates for every message that carries any.
+            on_state (callable): Called with True once subscribed and with False when the socket dropped.
+            url (str): The WebSocket URL, a local stand-in server can be used for testing.
+        """
+        self.on_update = on_update
+        self.on_state = on_state
+        self.url = url
+        self.app = None  # The websocket.WebSocketApp of the running thread, to close it from stop
+        self.thread = None
+        self.stopped = threading.Event()
+        self.lock = threading.Lock()  # Guards app and stopped between stop and the stream thread
+
+    @staticmethod
+    def available():
+        """Returns whether the optional websocket-client package is installed.
+
+        Without it the widget keeps polling over REST. The package is only looked up here
+        and imported by the stream thread, so it does not slow down the startup.
+        """
+        return importlib.util.find_spec("websocket") is not None
+
+    def start(self):
+        """Starts the stream thread, which reconnects until stop is called."""
+        if not self.available() or self.thread is not None:
+            return
+        self.stopped = threading.Event()  # A fresh event, so an old thread still winding down stays stopped
+        self.thread = threading.Thread(target=self.run, args=(self.stopped,), name="biwi-stream", daemon=True)
+        self.thread.start()
+
+    def stop(self, wait=False):
+        """Closes the socket and ends the stream thread.
+
+        The thread ends on its own, a thread that is still connecting closes its socket
+        once it is open. A new stream can be started right away.
+
+        Args:
+            wait (bool): Whether to wait up to STOP_TIMEOUT for the thread to end, for
+                example before exiting. Callbacks on the GUI thread should not wait.
+        """
+        with self.lock:
+            self.stopped.set()
+            app, self.app = self.app, None
+        if app is not None and app.sock is not None:
+            app.sock.abort()  # Wakes the stream thread, which closes the socket and ends
+        if wait and self.thread is not None:
+            self.thread.join(STOP_TIMEOUT)
+        self.thread = None
+
+    def run(self, stopped):
+        """Keeps the socket connected, backing off between reconnects.
+
+        Each socket belongs to this call only, so a thread that is being stopped can
+        neither replace the socket of a newer one nor report its state.
+
+        Args:
+            stopped (threading.Event): Set when this thread should end.
+        """
+        import websocket  # websocket-client
+        attempt = 0
+        while not stopped.is_set():
+            opened = threading.Event()  # Set once this socket is subscribed
+            app = websocket.WebSocketApp(
+                self.url,
+                on_open=lambda app: self.handle_open(app, stopped, opened),
+                on_message=self.handle_message,
+            )
+            with self.lock:
+                if stopped.is_set():
+                    break  # Stopped while the socket was created
+                self.app = app
+            app.run_forever(ping_interval=30, ping_timeout=10)  # Returns when the socket closes
+            with self.lock:
+                if self.app is app:
+                    self.app = None
+            if opened.is_set():
+                attempt = 0  # The connection worked, start the backoff over
+                if not stopped.is_set():
+                    self.on_state(False)
+            if stopped.wait(backoff_delay(attempt, RECONNECT_BASE_DELAY, RECONNECT_MAX_DELAY)):
+                break
+            attempt += 1
+
+    def handle_open(self, app, stopped, opened):
+        """Subscribes to blocks, mempool statistics and fees."""
+        if stopped.is_set():
+            app.close()  # Stopped while connecting
+            return
+        app.send(json.dumps({"action": "want", "data": ["blocks", "stats"]}))
+        opened.set()
+        self.on_state(True)
+
+    def handle_message(self, app, message):
+        """Hands the updates of a message to the callback."""
+        updates = parse_message(message)
+        if updates:
+            self.on_update(updates)
@@ -0,0 +1,122 @@
+TOTAL_BITCOINS = 21_000_000  # Total number of Bitcoins that can ever exist
+
+
+class Metric:
+    def __init__(self, label, source, field, extract, format_value, row, column=True, optional=False):
+        """Initializes the descriptor of one displayed metric.
+
+        Args:
+            label (str): The label name, used in the UI and in label_visibility.
+            source (str): The name of the source in bitcoin_data.SOURCES that provides the value.
+            field (str): The key of the formatted value in the output of bitcoin_data.format_data.
+            extract (callable): Picks the number from the value of the source. For the market
+                source it gets the market data of the current currency.
+            format_value (callable): Turns the number into a string, given the SnapshotFormatter.
+            row (str): The row template, filled in with the formatted value, the column width,
+                the currency symbol and the currency code.
+            column (bool): Whether the value counts towards the width of the value column.
+            optional (bool): Whether the row is hidden until it is turned on in the settings.
+        """
+        self.label = label
+        self.source = source
+        self.field = field
+        self.extract = extract
+        self.format_value = format_value
+        self.row = row
+        self.column = column
+        self.optional = optional
+
+    def render(self, value, width, symbol, code):
+        """Returns the row of the metric for a formatted value."""
+        return self.row.format(value=value, width=width, symbol=symbol, code=code)
+
+
+def _integer(formatter, value):
+    return formatter.numbers.integer(value)
+
+
+def _percent(formatter, value):
+    return formatter.numbers.decimal(value, 3)
+
+
+def _fee_rate(formatter, value):
+    return formatter.numbers.decimal(value, 1)
+
+
+# All metrics in display order
+METRICS = (
+    Metric("Price", "market", "formatted_price", lambda market: market['current_price'], _integer,
+           "BTC - {code}       : {value:>{width}} {symbol}"),
+    Metric("Change", "market", "formatted_change_24h", lambda market: market['price_change_percentage_24h'], _percent,
+           "Change % (24h)  : {value:>{width}} %", column=False),
+    Metric("Low", "market", "formatted_low_24h", lambda market: market['low_24h'], _integer,
+           "Low (24h)       : {value:>{width}} {symbol}"),
+    Metric("High", "market", "formatted_high_24h", lambda market: market['high_24h'], _integer,
+           "High (24h)      : {value:>{width}} {symbol}"),
+    Metric("ATH", "market", "formatted_ath", lambda market: market['ath'], _integer,
+           "All-Time High   : {value:>{width}} {symbol}"),
+    Metric("Market Cap", "market", "formatted_market_cap", lambda market: market['market_cap'], _integer,
+           "Market Cap      : {value:>{width}} {symbol}"),
+    Metric("Volume", "market", "formatted_volume", lambda market: market['total_volume'], _integer,
+           "Volume (24h)    : {value:>{width}} {symbol}"),
+    Metric("Mined", "market", "formatted_circulating_supply", lambda market: market['circulating_supply'], _integer,
+           "Mined ₿         : {value:>{width}} ₿"),
+    Metric("Unmined", "market", "formatted_missing_bitcoins", lambda market: TOTAL_BITCOINS - market['circulating_supply'], _integer,
+           "Unmined ₿       : {value:>{width}} ₿"),
+    Metric("Unmined %", "market", "formatted_percentage_missing",
+           lambda market: (TOTAL_BITCOINS - market['circulating_supply']) / TOTAL_BITCOINS * 100, _percent,
+           "Unmined ₿ (%)   : {value:>{width}} %", column=False),
+    Metric("Block Height", "block_height", "block_height", lambda height: height, _integer,
+           "Block Height    : {value:>{width}}"),
+    Metric("Hashrate", "hashrate", "hashrate", lambda hashrate: int(hashrate), _integer,
+           "Hashrate (EH/s) : {value:>{width}}"),
+    Metric("Unconfirmed TX", "unconfirmed_tx", "unconfirmed_tx", lambda count: count, _integer,
+           "Unconfirmed TX  : {value:>{width}}"),
+    Metric("Fees", "fees", "fees_output", lambda fees: fees, lambda formatter, fees: formatter.format_fees(fees),
+           "Fees (sat/vB)   : {value:>{width}}"),
+    # Fee distribution of the mempool at the percentiles of fee_distribution.PERCENTILES
+    Metric("Fee Percentiles", "fee_distribution", "fee_percentiles", lambda distribution: distribution['rates'],
+           lambda formatter, rates: formatter.format_series(rates, 1),
+           "Fee p10·50·90   : {value:>{width}}", optional=True),
+    Metric("Next Block Fee", "fee_distribution", "next_block_fee", lambda distribution: distribution['next_block_median'], _fee_rate,
+           "Next Block Fee  : {value:>{width}}", optional=True),
+    Metric("Waiting vMB", "fee_distribution", "waiting_vsize", lambda distribution: [vsize / 1_000_000 for vsize in distribution['vsize_above']],
+           lambda formatter, vsizes: formatter.format_series(vsizes, 1),
+           "vMB > p10·50·90 : {value:>{width}}", optional=True),
+    Metric("Blocks To Confirm", "fee_distribution", "blocks_to_confirm", lambda distribution: distribution['blocks'],
+           lambda formatter, blocks: formatter.format_series(blocks),
+           "Blocks p10·50·90: {value:>{width}}", optional=True),
+)
+
+LABELS = tuple(metric.label for metric in METRICS)  # Label names in display order
+DEFAULT_VISIBILITY = {metric.label: not metric.optional for metric in METRICS}  # Optional rows start hidden
+
+# Labels that show values of each source in bitcoin_data.SOURCES
+SOURCE_LABELS = {}
+for _metric in METRICS:
+    SOURCE_LABELS.setdefault(_metric.source, []).append(_metric.label)
+
+# Label names used by earlier versions, mapped to the current ones
+LEGACY_LABELS = {
+    "Change (24h)": "Change",
+    "Remaining": "Unmined",
+    "Remaining %": "Unmined %",
+}
+
+
+def visible_metrics(label_visibility):
+    """Returns the metrics whose label is visible.
+
+    Args:
+        label_visibility (dict): The visibility of each label. Labels missing from it are
+            visible unless their row is optional.
+
+    Returns:
+        list: The visible Metric objects in display order.
+    """
+    return [metric for metric in METRICS if label_visibility.get(metric.label, not metric.optional)]
+
+
+def sources_for(metrics):
+    """Returns the names of the sources the given metrics need, in a stable order."""
+    return list(dict.fromkeys(metric.source for metric in metrics))
@@ -0,0 +1,94 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from bitcoin_data import format_data, merge_results  # Import functions to format fetched data
+from biwi_daemon import fetch_via_daemon  # Import function to fetch data through the daemon if one is running
+from data_processing import process_data  # Import data processing function
+import instrumentation  # Import the optional timing spans
+
+
+class RefreshTask(QRunnable):
+    def __init__(self, currency, finished, snapshot_store=None, sources=None, previous_results=None, history=None, metrics=None):
+        """Initializes a single background refresh.
+
+        Args:
+            currency (str): The currency to process the data for.
+            finished (pyqtBoundSignal): The signal used to hand the result back to the GUI thread.
+            snapshot_store (SnapshotStore, optional): Where to save a successful refresh.
+            sources (list, optional): Names of the sources to fetch. Defaults to all.
+            previous_results (dict, optional): Earlier results that fill in the sources not fetched.
+            history (MetricHistory, optional): Where to record the fetched values.
+            metrics (list, optional): The Metric objects to format and render. Defaults to all.
+        """
+        super().__init__()
+        self.currency = currency
+        self.sources = sources
+        self.previous_results = previous_results or {}
+        self.finished = finished
+        self.snapshot_store = snapshot_store
+        self.history = history
+        self.metrics = metrics
+
+    def run(self):
+        """Fetches and processes the data in a pool thread."""
+        results, processed_data = None, None
+        try:
+            results = fetch_via_daemon(self.sources)  # Falls back to fetching directly
+            merged_results = merge_results(self.previous_results, results)  # Failed sources keep their last good value
+            if self.history is not None:
+                self.history.record_results(results, self.currency)
+                self.history.flush()  # Written here, off the GUI thread
+            with instrumentation.span("format"):
+                data = format_data(merged_results, self.currency, self.history, self.metrics)
+                processed_data = process_data(data, self.metrics) if data else None
+            if data and self.snapshot_store:
+                self.snapshot_store.save(merged_results, data, self.currency)  # For the next startup
+        except Exception as e:
+            print(f"Error: refresh failed: {e}")
+        self.finished.emit(self.currency, results, processed_data)  # Queued to the GUI thread
+
+
+class RefreshWorker(QObject):
+    # Currency, raw results of the fetched sources and processed data for the labels (None if the refresh failed)
+    data_ready = pyqtSignal(str, object, object)
+    task_finished = pyqtSignal(str, object, object)  # Internal: result of a finished task
+
+    def __init__(self, snapshot_store=None, history=None, parent=None):
+        """Initializes the worker that runs data refreshes off the GUI thread.
+
+        Args:
+            snapshot_store (SnapshotStore, optional): Where to save each successful refresh.
+            history (MetricHistory, optional): Where to record the fetched values.
+            parent (QObject, optional): The parent object. Defaults to None.
+        """
+        super().__init__(parent)
+        self.snapshot_store = snapshot_store
+        self.history = history
+        self.running = False  # Whether a refresh is in flight
+        self.task_finished.connect(self.on_task_finished)
+
+    def request_refresh(self, currency, sources=None, previous_results=None, metrics=None):
+        """Starts a background refresh, collapsing overlapping requests into one.
+
+        Requests made while a refresh is running are dropped. The raw results hold the
+        market data of every currency, so a currency switch in between can be rendered
+        from them without another fetch.
+
+        Args:
+            currency (str): The currency to process the data for.
+            sources (list, optional): Names of the sources to fetch. Defaults to all.
+            previous_results (dict, optional): Earlier results that fill in the sources not fetched.
+            metrics (list, optional): The Metric objects to format and render. Defaults to all.
+
+        Returns:
+            bool: True if a refresh was started.
+        """
+        if self.running:
+            return False
+        self.running = True
+        task = RefreshTask(currency, self.task_finished, self.snapshot_store, sources, previous_results, self.history, metrics)
+        QThreadPool.globalInstance().start(task)
+        return True
+
+    def on_task_finished(self, currency, results, processed_data):
+        """Publishes a finished refresh."""
+        self.running = False
+        self.data_ready.emit(currency, results, processed_data)
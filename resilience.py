@@ -0,0 +1,96 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Returns the wait before the next retry using exponential backoff with full jitter.
+
+    The upper bound doubles with every attempt up to the cap, and the actual wait is
+    picked at random below it so that many clients do not retry in lockstep.
+
+    Args:
+        attempt (int): The number of failed attempts so far, starting at 0.
+        base (float): The upper bound of the first wait in seconds.
+        cap (float): The largest possible wait in seconds.
+
+    Returns:
+        float: Seconds to wait.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    def __init__(self, host, failure_threshold=3, cooldown=300):
+        """Initializes the circuit breaker of a single host.
+
+        Args:
+            host (str): The host the breaker protects.
+            failure_threshold (int): Consecutive failures after which the host is skipped.
+            cooldown (float): Seconds to skip the host before trying it again.
+        """
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0  # Consecutive failed requests
+        self.opened_at = None  # When the breaker opened, None while requests are let through
+        self.trial_running = False  # Whether the single trial request after the cooldown is in flight
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        """Returns whether a request to the host may be sent now.
+
+        While the breaker is open, requests are refused until the cooldown is over. Then
+        one trial request is let through; its outcome closes or reopens the breaker.
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at < self.cooldown or self.trial_running:
+                return False
+            self.trial_running = True
+            return True
+
+    def record_success(self):
+        """Closes the breaker after a successful request."""
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        """Counts a failed request and opens the breaker once the threshold is reached."""
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.trial_running:
+                    print(f"Error: {self.host} failed {self.failures} times, pausing it for {self.cooldown} seconds.")
+                self.opened_at = time.time()
+                self.trial_running = False
+
+    def remaining_cooldown(self):
+        """Returns the seconds until the host is tried again, 0 if the breaker is closed."""
+        with self.lock:
+            if self.opened_at is None:
+                return 0
+            return max(0, self.cooldown - (time.time() - self.opened_at))
+
+
+_breakers = {}  # CircuitBreaker instances keyed by host
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker_for(url):
+    """Returns the shared circuit breaker for the host of a URL."""
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+def reset_circuit_breakers():
+    """Closes all circuit breakers, for example between benchmark runs."""
+    with _breakers_lock:
+        _breakers.clear()
@@ -0,0 +1,111 @@
+import threading
+import time
+
+
+class CacheEntry:
+    def __init__(self, response, fetched_at):
+        """Initializes a cached response.
+
+        Args:
+            response (requests.Response): The response of the last successful request.
+            fetched_at (float): The time when the response was received or last revalidated.
+        """
+        self.response = response
+        self.fetched_at = fetched_at
+        self.etag = response.headers.get("ETag")  # Validator for If-None-Match
+        self.last_modified = response.headers.get("Last-Modified")  # Validator for If-Modified-Since
+
+
+class ResponseCache:
+    def __init__(self, ttls=None, default_ttl=0):
+        """Initializes the response cache.
+
+        Args:
+            ttls (dict, optional): Time-to-live in seconds keyed by URL prefix.
+            default_ttl (float): Time-to-live for URLs that match no prefix.
+        """
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.entries = {}  # Cached responses keyed by URL
+        self.hits = 0  # Requests answered from memory
+        self.misses = 0  # Requests that went to the network
+        self.revalidations = 0  # Misses that the server answered with 304 Not Modified
+        self.lock = threading.Lock()
+
+    def ttl_for(self, url):
+        """Returns the time-to-live of a URL, using the longest matching prefix."""
+        matches = [prefix for prefix in self.ttls if url.startswith(prefix)]
+        return self.ttls[max(matches, key=len)] if matches else self.default_ttl
+
+    def get_fresh(self, url):
+        """Returns the cached response if it has not expired yet.
+
+        Args:
+            url (str): The requested URL.
+
+        Returns:
+            requests.Response: The cached response, or None if the network has to be asked.
+        """
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry and time.time() - entry.fetched_at < self.ttl_for(url):
+                self.hits += 1
+                return entry.response
+            self.misses += 1
+            return None
+
+    def conditional_headers(self, url):
+        """Returns the headers to revalidate an expired response with the server."""
+        with self.lock:
+            entry = self.entries.get(url)
+            headers = {}
+            if entry and entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry and entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+            return headers
+
+    def store(self, url, response):
+        """Caches a successful response that can be used again.
+
+        A response is only kept if its URL has a time-to-live or the server sent a
+        validator, otherwise it could never be served from memory or revalidated.
+        """
+        if self.ttl_for(url) <= 0 and not (response.headers.get("ETag") or response.headers.get("Last-Modified")):
+            return
+        with self.lock:
+            self.entries[url] = CacheEntry(response, time.time())
+
+    def revalidate(self, url):
+        """Marks the cached response as fresh again after a 304 Not Modified.
+
+        Returns:
+            requests.Response: The cached response, or None if nothing is cached for the URL.
+        """
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            entry.fetched_at = time.time()
+            self.revalidations += 1
+            return entry.response
+
+    def clear(self):
+        """Drops all cached responses and resets the counters."""
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = self.revalidations = 0
+
+    def stats(self):
+        """Returns the hit and miss counts of the cache.
+
+        Returns:
+            dict: The number of hits, misses, revalidations and cached URLs.
+        """
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "entries": len(self.entries),
+            }
@@ -0,0 +1,184 @@
+import time
+from resilience import backoff_delay  # Import the backoff used after failed fetches
+
+REQUEST_BUDGET = 5 / 600  # Requests per second, the volume of refreshing five sources every 10 minutes, shared by all six sources including fee_distribution
+HIDDEN_FACTOR = 4  # Intervals are stretched by this factor while the widget is hidden
+RETRY_BASE_DELAY = 30  # Seconds before the first retry of a failed source
+RETRY_MAX_DELAY = 600  # Longest wait between retries of a failed source
+
+
+class SourcePolicy:
+    def __init__(self, min_interval, max_interval, threshold, signal=None):
+        """Initializes the refresh policy of a data source.
+
+        Args:
+            min_interval (float): The shortest refresh interval in seconds, used while the value is volatile.
+            max_interval (float): The longest refresh interval in seconds, used while the value is calm.
+            threshold (float): The relative change between two fetches that counts as volatile.
+            signal (callable, optional): Extracts the number to watch from the fetched value.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.threshold = threshold
+        self.signal = signal or (lambda value: value)
+
+
+# Refresh policies of the sources in bitcoin_data.fetch_all
+DEFAULT_POLICIES = {
+    'market': SourcePolicy(60, 600, 0.002, lambda market: market['usd']['current_price']),  # Price moves by 0.2 %
+    'fees': SourcePolicy(60, 600, 0.1, lambda fees: fees['fastestFee']),
+    'unconfirmed_tx': SourcePolicy(120, 1200, 0.05),
+    'block_height': SourcePolicy(120, 1200, 0),  # Any new block counts
+    'hashrate': SourcePolicy(1800, 7200, 0.01),
+    'fee_distribution': SourcePolicy(120, 1200, 0.1, lambda distribution: distribution['next_block_median']),
+}
+
+
+class PollScheduler:
+    def __init__(self, policies=None, request_budget=REQUEST_BUDGET):
+        """Initializes the scheduler that decides when each data source is refreshed.
+
+        Every source starts due. After each fetch its interval halves if the value moved
+        more than its threshold and grows by half otherwise, within the bounds of its
+        policy. The intervals together never exceed the request budget.
+
+        Args:
+            policies (dict, optional): SourcePolicy objects keyed by source name.
+            request_budget (float): The largest number of requests per second of all sources together.
+        """
+        self.policies = policies or DEFAULT_POLICIES
+        self.request_budget = request_budget
+        self.intervals = {name: policy.max_interval for name, policy in self.policies.items()}
+        self.last_fetch = {name: 0.0 for name in self.policies}  # When each source was last fetched
+        self.next_due = {name: 0.0 for name in self.policies}  # All sources are due right away
+        self.last_signals = {}  # Last watched number of each source
+        self.failures = {name: 0 for name in self.policies}  # Consecutive failures of each source
+        self.hidden = False
+        self.paused = set()  # Sources that are updated by other means, like the WebSocket feed
+        self.disabled = set()  # Sources no visible metric needs
+
+    def due_sources(self, now=None):
+        """Returns the names of the sources that should be fetched now."""
+        now = time.time() if now is None else now
+        return [name for name, due in self.next_due.items() if due <= now and self._polled(name)]
+
+    def seconds_until_next(self, now=None):
+        """Returns the seconds until the next source is due, 0 if one is due already."""
+        now = time.time() if now is None else now
+        pending = [due for name, due in self.next_due.items() if self._polled(name)]
+        return max(0.0, min(pending) - now) if pending else RETRY_MAX_DELAY
+
+    def record_success(self, name, value, now=None):
+        """Adapts the interval of a source to how much its value changed.
+
+        Args:
+            name (str): The source name.
+            value: The fetched value.
+            now (float, optional): The time of the fetch.
+        """
+        now = time.time() if now is None else now
+        policy = self.policies[name]
+        self.failures[name] = 0
+        try:
+            signal = float(policy.signal(value))
+        except (KeyError, TypeError, ValueError):
+            signal = None
+
+        previous = self.last_signals.get(name)
+        if signal is not None and previous is not None:
+            change = abs(signal - previous) / abs(previous) if previous else abs(signal)
+            if change > policy.threshold:
+                self.intervals[name] = max(policy.min_interval, self.intervals[name] / 2)
+            else:
+                self.intervals[name] = min(policy.max_interval, self.intervals[name] * 1.5)
+        if signal is not None:
+            self.last_signals[name] = signal
+
+        self._apply_budget(name)
+        self.last_fetch[name] = now
+        self.next_due[name] = now + self._effective_interval(name)
+
+    def record_failure(self, name, now=None, retry_after=None):
+        """Schedules a retry of a failed source, backing off with every failure.
+
+        Args:
+            name (str): The source name.
+            now (float, optional): The time of the fetch.
+            retry_after (float, optional): Seconds the upstream asked to wait. The source is
+                then deferred by exactly that long, without counting as a failure.
+        """
+        now = time.time() if now is None else now
+        if retry_after is not None:
+            self.next_due[name] = now + retry_after
+            return
+        delay = backoff_delay(self.failures[name], RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+        self.failures[name] += 1
+        self.next_due[name] = now + delay
+
+    def set_hidden(self, hidden):
+        """Slows all sources down while the widget is hidden and catches up once it is shown."""
+        if hidden == self.hidden:
+            return
+        self.hidden = hidden
+        for name in self.policies:
+            if not self.failures[name] and self.last_fetch[name]:
+                self.next_due[name] = self.last_fetch[name] + self._effective_interval(name)
+
+    def mark_due(self, names=None):
+        """Makes sources due right away, for example on a manual refresh.
+
+        Args:
+            names (iterable, optional): The source names. Defaults to all sources.
+        """
+        for name in (names or self.policies):
+            self.next_due[name] = 0.0
+
+    def set_paused(self, names, paused):
+        """Stops or resumes polling of sources.
+
+        Resumed sources are due right away, since their pushed values may be outdated.
+
+        Args:
+            names (iterable): The source names.
+            paused (bool): Whether polling of the sources stops.
+        """
+        for name in names:
+            if paused:
+                self.paused.add(name)
+            elif name in self.paused:
+                self.paused.discard(name)
+                self.next_due[name] = 0.0
+
+    def set_disabled(self, names):
+        """Sets the sources that are not polled at all because nothing shows them.
+
+        Sources that are enabled again are due right away.
+
+        Args:
+            names (iterable): The names of the disabled sources.
+        """
+        names = set(names)
+        for name in self.disabled - names:
+            self.next_due[name] = 0.0
+        self.disabled = names
+
+    def _polled(self, name):
+        """Returns whether a source is polled, neither paused nor disabled."""
+        return name not in self.paused and name not in self.disabled
+
+    def _effective_interval(self, name):
+        """Returns the interval of a source including the slowdown while hidden."""
+        return self.intervals[name] * (HIDDEN_FACTOR if self.hidden else 1)
+
+    def _apply_budget(self, name):
+        """Stretches the interval of a source so all sources together stay within the request budget.
+
+        Calm sources sit at their longest interval, which leaves the spare budget to the
+        volatile ones.
+        """
+        others = sum(1 / interval for other, interval in self.intervals.items() if other != name)
+        spare = self.request_budget - others
+        if spare <= 0:
+            self.intervals[name] = max(self.intervals[name], self.policies[name].max_interval)
+        elif 1 / self.intervals[name] > spare:
+            self.intervals[name] = 1 / spare
@@ -1,11 +1,12 @@
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QCheckBox, QPushButton
 
 class SettingsDialog(QDialog):
-    def __init__(self, output_labels, parent=None):
+    def __init__(self, output_labels, settings_manager, parent=None):
         """Initializes the SettingsDialog for adjusting label visibility settings.
 
         Args:
             output_labels (dict): A dictionary of output labels from the main window.
+            settings_manager (SettingsManager): The settings shared with the main window.
             parent (QWidget, optional): The parent widget for the dialog. Defaults to None.
         """
         super().__init__(parent)
@@ -13,6 +14,7 @@ class SettingsDialog(QDialog):
         self.setGeometry(100, 100, 300, 400)  # Set the initial size and position of the dialog
 
         self.output_labels = output_labels  # Store the output labels from the main window
+        self.settings_manager = settings_manager  # Store the shared settings
         self.label_checkboxes = {}  # Dictionary to store the checkboxes for label visibility
 
         layout = QVBoxLayout()  # Create a vertical box layout for the dialog
@@ -46,3 +48,9 @@ class SettingsDialog(QDialog):
         if self.parent():
             self.parent().adjustSize()  # Adjust the size of the parent window
 
+    def accept(self):
+        """Stores the chosen label visibility in the shared settings and closes the dialog."""
+        self.settings_manager.set("label_visibility", {
+            label_name: checkbox.isChecked() for label_name, checkbox in self.label_checkboxes.items()
+        })
+        super().accept()
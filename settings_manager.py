@@ -1,53 +1,151 @@
+import copy
 import json
-from PyQt5.QtGui import QColor
+import os
+import tempfile
+import threading
+from metrics import DEFAULT_VISIBILITY, LEGACY_LABELS  # Import the label names of the metric registry
+
+
+def atomic_write_json(filename, data):
+    """Writes data as JSON so that the file is either fully replaced or left untouched.
+
+    The data is written to a temporary file in the same directory, flushed to disk and
+    then renamed over the target, so a crash cannot leave a half-written file behind.
+
+    Args:
+        filename (str): The path of the JSON file.
+        data: The JSON serializable data to write.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=4)  # indent=4 for better readability
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filename)  # Atomic on POSIX and Windows
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 
 class SettingsManager:
-    def __init__(self, filename="settings.json"):
-        """Initializes the SettingsManager with a filename for the JSON file."""
+    def __init__(self, filename="settings.json", save_delay=2.0):
+        """Initializes the SettingsManager with a filename for the JSON file.
+
+        The settings are read once and then kept in memory. Changes are written back
+        only when a value actually changed, batched by a short delay.
+
+        Args:
+            filename (str): The path of the settings file.
+            save_delay (float): Seconds to wait for further changes before writing.
+        """
         self.filename = filename
+        self.save_delay = save_delay
+        self.settings = None  # In-memory settings, loaded on first use
+        self.derived = {}  # Values computed at runtime that are never written, like largest_string_length
+        self.lock = threading.RLock()  # The settings are read from the refresh thread too
+        self.save_timer = None  # Pending debounced write
 
     def save_settings(self, settings):
-        """Saves the current settings to a JSON file.
+        """Updates the settings and schedules a write if any value changed.
         
         Args:
             settings (dict): A dictionary containing the settings.
         """
-        with open(self.filename, "w") as f:
-            json.dump(settings, f, indent=4)  # indent=4 for better readability
+        with self.lock:
+            current = self._ensure_loaded()
+            # Compare in JSON form so tuples and lists with the same values are equal
+            changes = {key: value for key, value in json.loads(json.dumps(settings)).items() if current.get(key) != value}
+            if changes:
+                current.update(changes)
+                self._schedule_save()
+
+    def set(self, key, value):
+        """Sets a single setting and schedules a write if its value changed."""
+        self.save_settings({key: value})
+
+    def get(self, key, default=None):
+        """Returns a single setting from memory."""
+        with self.lock:
+            return copy.deepcopy(self._ensure_loaded().get(key, default))
 
     def load_settings(self):
-        """Loads saved settings from a JSON file.
+        """Returns the settings, reading the JSON file only on first use.
         
         Returns:
             dict: A dictionary with the loaded settings or default values if the file is not found.
         """
+        with self.lock:
+            return copy.deepcopy(self._ensure_loaded())
+
+    def flush(self):
+        """Writes pending changes to disk immediately."""
+        with self.lock:
+            if self.save_timer is not None:
+                self.save_timer.cancel()
+                self.save_timer = None
+                self._write()
+
+    def _ensure_loaded(self):
+        """Reads the settings file into memory if that has not happened yet."""
+        if self.settings is None:
+            try:
+                with open(self.filename, "r") as f:
+                    self.settings = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                # Use default values if the file does not exist or is invalid
+                self.settings = self.default_settings()
+            self.settings.pop("largest_string_length", None)  # Derived value, kept in memory only
+            visibility = self.settings.setdefault("label_visibility", {})
+            for legacy, label in LEGACY_LABELS.items():
+                if legacy in visibility:
+                    visibility.setdefault(label, visibility.pop(legacy))  # Renamed since the file was written
+            for label, visible in DEFAULT_VISIBILITY.items():
+                visibility.setdefault(label, visible)  # Added since the file was written
+        return self.settings
+
+    def _schedule_save(self):
+        """Restarts the write delay so that a burst of changes results in one write."""
+        if self.save_timer is not None:
+            self.save_timer.cancel()
+        self.save_timer = threading.Timer(self.save_delay, self.flush)
+        self.save_timer.daemon = True
+        self.save_timer.start()
+
+    def _write(self):
+        """Replaces the settings file with the in-memory settings."""
         try:
-            with open(self.filename, "r") as f:
-                settings = json.load(f)
-                return settings
-        except (FileNotFoundError, json.JSONDecodeError):
-            # Return default values if the file does not exist or is invalid
-            return {
-                "background_color": [0, 0, 0, 200],  # Default background color (Black with 200 Alpha)
-                "font_color": [255, 255, 255],  # Default font color (White)
-                "transparency": 200,  # Default transparency
-                "font_size": 10,  # Default font size
-                "currency": "USD",  # Default currency
-                "label_visibility": {
-                    "Price": True,  # Visibility of the Price label
-                    "Change (24h)": True,  # Visibility of the Change (24h) label
-                    "High": True,  # Visibility of the High label
-                    "Low": True,   # Visibility of the Low label
-                    "Market Cap": True,  # Visibility of the Market Cap label
-                    "Volume": True,  # Visibility of the Volume label
-                    "Mined": True,  # Visibility of the Mined label
-                    "Unmined": True,  # Visibility of the Remaining Bitcoins label
-                    "Unmined %": True,  # Visibility of the Remaining percentage label
-                    "Block Height": True,  # Visibility of the Block Height label
-                    "Hashrate": True,  # Visibility of the Hashrate label
-                    "Unconfirmed TX": True,  # Visibility of the Unconfirmed Transactions label
-                    "ATH": True,  # Visibility of the All-Time High label
-                    "Fees": True,  # Visibility of the Fees label
-                }
-            }
+            atomic_write_json(self.filename, self.settings)
+        except OSError as e:
+            print(f"Error saving settings: {e}")
+
+    def default_settings(self):
+        """Returns the default settings used when the file is missing or invalid."""
+        return {
+            "background_color": [0, 0, 0],  # Default background color (Black)
+            "font_color": [255, 255, 255],  # Default font color (White)
+            "transparency": 200,  # Default transparency
+            "font_size": 10,  # Default font size
+            "currency": "usd",  # Default currency
+            "label_visibility": dict(DEFAULT_VISIBILITY),  # Every metric of the registry except the optional ones
+        }
+
+
+_shared_managers = {}  # Shared SettingsManager instances keyed by filename
+_shared_lock = threading.Lock()
+
+
+def get_settings_manager(filename="settings.json"):
+    """Returns the SettingsManager shared by all parts of the widget.
+
+    Args:
+        filename (str): The path of the settings file.
+
+    Returns:
+        SettingsManager: The shared instance for the file.
+    """
+    with _shared_lock:
+        if filename not in _shared_managers:
+            _shared_managers[filename] = SettingsManager(filename)
+        return _shared_managers[filename]
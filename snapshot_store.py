@@ -0,0 +1,53 @@
+import json
+import time
+from settings_manager import atomic_write_json  # Import helper for crash-safe writes
+from bitcoin_data import SourceResult  # Import the result model of a data source
+
+
+class SnapshotStore:
+    def __init__(self, filename="snapshot.json"):
+        """Initializes the SnapshotStore with a filename for the JSON file.
+
+        Args:
+            filename (str): The file that holds the last successful refresh, next to settings.json.
+        """
+        self.filename = filename
+
+    def save(self, results, formatted_data, currency):
+        """Saves the last successful refresh atomically.
+
+        Args:
+            results (dict): SourceResult objects of all sources keyed by source name.
+            formatted_data (dict): The data as returned by format_data.
+            currency (str): The currency of the formatted data.
+        """
+        snapshot = {
+            "saved_at": time.time(),  # When the data was fetched
+            "currency": currency,
+            "results": {name: result.to_dict() for name, result in results.items()},
+            "formatted": formatted_data,
+        }
+        try:
+            atomic_write_json(self.filename, snapshot)
+        except (OSError, TypeError, ValueError) as e:
+            print(f"Error saving snapshot: {e}")
+
+    def load(self):
+        """Loads the last saved snapshot.
+
+        Returns:
+            dict: The snapshot with its 'saved_at', 'currency', 'results' and 'formatted'
+            entries, with the results as SourceResult objects, or None if there is no valid snapshot.
+        """
+        try:
+            with open(self.filename, "r") as f:
+                snapshot = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not isinstance(snapshot, dict) or not isinstance(snapshot.get("results"), dict):
+            return None
+        snapshot["results"] = {
+            name: SourceResult.from_dict(result)
+            for name, result in snapshot["results"].items() if isinstance(result, dict)
+        }
+        return snapshot
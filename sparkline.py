@@ -0,0 +1,107 @@
+from array import array
+from PyQt5.QtWidgets import QWidget
+from PyQt5.QtGui import QPainter, QPainterPath, QPen, QPixmap
+from PyQt5.QtCore import Qt, QEvent, QSize
+
+SPARKLINE_WIDTH = 60  # Width of a sparkline in pixels
+SPARKLINE_MARGIN = 3  # Vertical space kept free above and below the line
+
+
+class Sparkline(QWidget):
+    def __init__(self, label, color, parent=None):
+        """Initializes a mini chart shown next to a label.
+
+        The line is rendered into a cached QPixmap, which is rebuilt only when new points
+        arrive or the size changes, so repaints while dragging only copy the pixmap.
+
+        Args:
+            label (QLabel): The label the sparkline belongs to, it follows its visibility.
+            color (QColor): The color of the line.
+            parent (QWidget, optional): The parent widget.
+        """
+        super().__init__(parent)
+        self.label = label
+        self.color = color
+        self.values = array('d')  # Points of the line, oldest first
+        self.pixmap = None  # Cached rendering of the line, None when it must be rebuilt
+        self.enabled = True  # Whether sparklines are switched on
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setFixedWidth(SPARKLINE_WIDTH)
+        label.installEventFilter(self)
+
+    def sizeHint(self):
+        return QSize(SPARKLINE_WIDTH, self.label.sizeHint().height())
+
+    def eventFilter(self, watched, event):
+        """Shows and hides the sparkline together with its label."""
+        if watched is self.label and event.type() in (QEvent.Show, QEvent.Hide):
+            self.setVisible(self.enabled and event.type() == QEvent.Show)
+        return False
+
+    def set_enabled(self, enabled):
+        """Switches the sparkline on or off."""
+        self.enabled = enabled
+        self.setVisible(enabled and self.label.isVisible())
+
+    def set_points(self, values):
+        """Sets the values to draw, rebuilding the cached pixmap only if they changed.
+
+        Args:
+            values (array): The values, oldest first.
+        """
+        if values == self.values:
+            return
+        self.values = values
+        self.pixmap = None
+        self.update()
+
+    def set_color(self, color):
+        """Sets the color of the line."""
+        self.color = color
+        self.pixmap = None
+        self.update()
+
+    def paintEvent(self, event):
+        """Copies the cached pixmap, rendering it first if the points or the size changed."""
+        ratio = self.devicePixelRatioF()
+        if self.pixmap is None or self.pixmap.size() != self.size() * ratio:
+            self.pixmap = self.render_pixmap(ratio)
+        painter = QPainter(self)
+        painter.drawPixmap(0, 0, self.pixmap)
+
+    def render_pixmap(self, ratio):
+        """Draws the line into a new transparent pixmap.
+
+        Args:
+            ratio (float): The device pixel ratio of the screen.
+
+        Returns:
+            QPixmap: The rendered line.
+        """
+        pixmap = QPixmap(self.size() * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.transparent)
+        if len(self.values) < 2:
+            return pixmap
+
+        low, high = min(self.values), max(self.values)
+        span = (high - low) or 1  # A flat line is drawn in the middle
+        width = self.width() - 1
+        height = self.height() - 2 * SPARKLINE_MARGIN
+        step = width / (len(self.values) - 1)
+
+        path = QPainterPath()
+        for index, value in enumerate(self.values):
+            x = index * step
+            y = SPARKLINE_MARGIN + height - (value - low) / span * height if high != low else self.height() / 2
+            if index:
+                path.lineTo(x, y)
+            else:
+                path.moveTo(x, y)
+
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(self.color, 1.2))
+        painter.drawPath(path)
+        painter.end()
+        return pixmap
@@ -1,5 +1,10 @@
-from PyQt5.QtWidgets import QVBoxLayout, QLabel, QWidget
+import time
+from PyQt5.QtWidgets import QVBoxLayout, QHBoxLayout, QLabel, QWidget, QGraphicsOpacityEffect
 from PyQt5.QtGui import QFont
+from sparkline import Sparkline  # Import the cached mini chart
+from metrics import LABELS  # Import the label names of the metric registry
+
+SPARKLINE_LABELS = ("Price", "Fees", "Hashrate")  # Labels with a sparkline next to them
 
 
 class UIComponents(QWidget):
@@ -19,18 +24,29 @@ class UIComponents(QWidget):
 
         # Labels for displaying output data
         self.output_labels = {}
-        for label_name in [
-            "Price", "Change", "Low", "High",  # Removed (24h)
-            "ATH", "Market Cap", "Volume", "Mined", 
-            "Unmined", "Unmined %", "Block Height", 
-            "Hashrate", "Unconfirmed TX", "Fees"
-        ]:
+        self.sparklines = {}  # Sparklines keyed by the label they belong to
+        for label_name in LABELS:
             # Create a QLabel for each output label
             self.output_labels[label_name] = QLabel(self)
             # Set the label's stylesheet for transparency and font color
             self.output_labels[label_name].setStyleSheet(f"background: transparent; color: {font_color.name()};")
-            # Add the label to the layout
-            self.layout.addWidget(self.output_labels[label_name])
+            # Add the label to the layout, with a sparkline to its right if it has one
+            if label_name in SPARKLINE_LABELS:
+                sparkline = Sparkline(self.output_labels[label_name], font_color, self)
+                self.sparklines[label_name] = sparkline
+                row = QHBoxLayout()
+                row.setSpacing(5)
+                row.addWidget(self.output_labels[label_name])
+                row.addWidget(sparkline)
+                self.layout.addLayout(row)
+            else:
+                self.layout.addWidget(self.output_labels[label_name])
+
+        # Last fired alert below the rows, hidden while there is none
+        self.alert_label = QLabel(self)
+        self.alert_label.setStyleSheet(f"background: transparent; color: {font_color.name()};")
+        self.alert_label.hide()
+        self.layout.addWidget(self.alert_label)
 
         # Apply the layout to the widget
         self.setLayout(self.layout)
@@ -39,15 +55,85 @@ class UIComponents(QWidget):
         self.monospace_font = QFont("Liberation Mono", font_size)
         for label in self.output_labels.values():
             label.setFont(self.monospace_font)
+        self.alert_label.setFont(self.monospace_font)
+
+        # Dimming used while the labels show data from a previous session
+        self.stale_effect = QGraphicsOpacityEffect(self)
+        self.stale_effect.setOpacity(0.6)
+        self.stale_effect.setEnabled(False)
+        self.setGraphicsEffect(self.stale_effect)
+        self.stale_labels = set()  # Labels showing a value left over from an earlier fetch
+        self.row_width = None  # Characters in the widest visible row, the window is resized when it changes
 
     def update_labels(self, processed_data):
-        """Updates the labels with formatted data.
+        """Updates the labels whose text changed.
+
+        Unchanged labels are left alone, so a streamed update of a single value does not
+        repaint or relayout the other rows.
 
         Args:
             processed_data (dict): A dictionary containing formatted strings for each label.
+
+        Returns:
+            bool: True if the widest visible row changed, so the window has to be resized.
         """
         for label_name, text in processed_data.items():
-            # Update the text for each label with the corresponding formatted data
             label = self.output_labels[label_name]
-            label.setText(text)
-            label.setMinimumSize(0, 0)  # Remove minimum size constraints to allow window resizing
+            if label.text() != text:
+                label.setText(text)
+        row_width = max((len(label.text()) for label in self.output_labels.values() if not label.isHidden()), default=0)
+        resized = row_width != self.row_width
+        self.row_width = row_width
+        return resized
+
+    def set_sparklines_enabled(self, enabled):
+        """Shows or hides all sparklines."""
+        for sparkline in self.sparklines.values():
+            sparkline.set_enabled(enabled)
+
+    def update_sparklines(self, points):
+        """Sets the values of the sparklines.
+
+        Args:
+            points (dict): Arrays of values keyed by label name.
+        """
+        for label_name, values in points.items():
+            self.sparklines[label_name].set_points(values)
+
+    def show_alert(self, message):
+        """Shows the message of a fired alert below the rows, None hides it."""
+        self.alert_label.setText(message or "")
+        self.alert_label.setVisible(bool(message))
+
+    def set_stale(self, stale, saved_at=None):
+        """Marks the labels as showing outdated data.
+
+        Args:
+            stale (bool): Whether the shown data is outdated.
+            saved_at (float, optional): When the outdated data was fetched, shown as tooltip.
+        """
+        self.stale_effect.setEnabled(stale)
+        if stale and saved_at:
+            self.setToolTip(f"Last updated {time.strftime('%Y-%m-%d %H:%M', time.localtime(saved_at))}, refreshing...")
+        else:
+            self.setToolTip("")
+
+    def set_stale_labels(self, label_names):
+        """Dims the labels whose source failed and that show their last good value.
+
+        Args:
+            label_names (list): The labels to dim, all others are shown normally.
+        """
+        label_names = set(label_names)
+        if label_names == self.stale_labels:
+            return
+        for label_name, label in self.output_labels.items():
+            if label_name in label_names:
+                effect = QGraphicsOpacityEffect(label)
+                effect.setOpacity(0.5)
+                label.setGraphicsEffect(effect)  # The label takes ownership of the effect
+                label.setToolTip("Update failed, showing the last known value")
+            elif label_name in self.stale_labels:
+                label.setGraphicsEffect(None)
+                label.setToolTip("")
+        self.stale_labels = label_names